@@ -0,0 +1,40 @@
+from collections import deque
+
+
+# ------ ACTIVE CASES NOTES ------
+# Keeps track of the cases which started within the last time_period (typically a week), replacing the old list of active
+# case events that was rebuilt after every single event. Cases are added in time order, so the oldest case is always at the
+# front of the queue and expiring old cases only ever looks at the front. Counts are also kept for each age ring
+# (0 = children, 1 = adults, 2 = elderly), looked up in the node->ring array from severity.RingArray, so the per-ring active
+# case numbers (and the peak of each) never need a rescan.
+
+class ActiveCases:
+    def __init__(self, time_period, ring):
+        self.time_period = time_period   # how long (in seconds) a case counts as "active"
+        self.ring = ring   # the age ring of each node
+        self.cases = deque()   # (time, ring) tuples for every active case, oldest first
+        self.rings = [0, 0, 0]   # number of active cases in each age ring
+        self.peaks = [0, 0, 0]   # the most active cases there have been at once in each age ring
+
+    def __len__(self):
+        return len(self.cases)
+
+    # adds a new case that started at the given time (expiring older cases first, so the peaks only count active cases)
+    def add(self, time, node):
+        self.expire(time)
+        ring = int(self.ring[node])
+        self.cases.append((time, ring))
+        self.rings[ring]+=1
+        if self.rings[ring]>self.peaks[ring]:
+            self.peaks[ring] = self.rings[ring]
+
+    # removes cases which started more than time_period before the given time
+    def expire(self, time):
+        cutoff = time-self.time_period
+        while self.cases and self.cases[0][0]<=cutoff:
+            ring = self.cases.popleft()[1]
+            self.rings[ring]-=1
+
+    # returns the peak number of active cases in each age ring (children, adults, elderly)
+    def peak_counts(self):
+        return tuple(self.peaks)
@@ -0,0 +1,72 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from modules import network as nw
+from modules import outbreak as ob
+from modules import sharednet as sn
+
+
+# ------ ENSEMBLE NOTES ------
+# Runs many replicates of the same outbreak (see outbreak.py) in parallel across a ProcessPoolExecutor. The network is built
+# (or passed in) once, published into shared memory (see sharednet.py) and attached to by every worker, so the workers don't
+# each hold a copy of it.
+# Each replicate gets its own independent random stream, spawned from one numpy SeedSequence, so an ensemble run with the
+# same seed always gives the same results however many workers it is spread over.
+# The results are returned as a NumPy structured array with one row per replicate (in replicate order).
+
+RESULT = np.dtype([
+    ('replicate', np.int32),   # the replicate's number (and the index of its spawned seed)
+    ('outbreak_size', np.int64),   # number of transmissions
+    ('infected', np.int64),   # number of actual infections
+    ('endemic', np.bool_),   # whether the outbreak was still going when the simulation was cut short
+    ('last_infection', np.int64),   # time (in seconds) of the final transmission
+    ('ring_cases', np.int64, (3,)),   # infections in each age ring (children, adults, elderly)
+    ('ring_peaks', np.int64, (3,)),   # peak active cases in each age ring
+    ('vaccinated', np.int64),
+    ('refused', np.int64),
+    ('op_changes', np.int64),
+])
+
+
+# converts a replicate's results dictionary into a row of the RESULT array
+def ResultRow(replicate, result):
+    return (replicate, result['outbreak_size'], result['infected'], result['endemic'], result['last_infection'],
+            result['ring_cases'], result['ring_peaks'], result['vaccinated'], result['refused'], result['op_changes'])
+
+
+# runs a single replicate in a worker process, on the network published in shared memory
+def RunReplicate(task):
+    params, spec, replicate, seed = task
+    neighbours, bneighbours = sn.Attach(spec)
+    result = ob.Simulate(params, neighbours, bneighbours, np.random.default_rng(seed))
+    return ResultRow(replicate, result)
+
+
+# runs `replicates` outbreaks with the given parameters, returning a RESULT array. If no network is given, one is built from
+# the parameters (with its own spawned seed). workers is the number of processes to use (all cores by default, and 1 runs
+# every replicate in this process)
+def RunEnsemble(params, replicates, seed=None, workers=None, neighbours=None, bneighbours=None):
+    params = ob.Parameters(params)
+    sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    network_seed, *seeds = sequence.spawn(replicates+1)   # one stream for the network, then one for each replicate
+
+    if neighbours is None:
+        nodes, neighbours, bneighbours = nw.MakeNetworks(params['N1'], params['N2'], params['N3'], params['factor'], csr=True, rng=np.random.default_rng(network_seed))
+
+    workers = workers if workers is not None else os.cpu_count()
+    results = np.zeros(replicates, dtype=RESULT)
+
+    # with a single worker, just run the replicates one after another
+    if workers==1 or replicates<=1:
+        for i in range(replicates):
+            results[i] = ResultRow(i, ob.Simulate(params, neighbours, bneighbours, np.random.default_rng(seeds[i])))
+        return results
+
+    with sn.SharedNetwork(neighbours, bneighbours) as shared:
+        tasks = [(params, shared.spec, i, seeds[i]) for i in range(replicates)]
+        with ProcessPoolExecutor(max_workers=min(workers, replicates)) as executor:
+            for row in executor.map(RunReplicate, tasks):
+                results[row[0]] = row
+
+    return results
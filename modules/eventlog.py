@@ -0,0 +1,108 @@
+import numpy as np
+
+from modules import events as ev
+
+
+# ------ EVENT LOG NOTES ------
+# The event log stores processed events in typed NumPy columns (time, type, node, primary) instead of a list of event objects,
+# along with running totals for each event type. Totals for outcomes which are not events in their own right (e.g. infections
+# that actually happened, vaccine refusals) can be added with tally(). Statistics are then read with count().
+#
+# Each event type has a retention policy:
+        # KEEP: the event is stored in the columns and counted
+        # COUNT: the event is only counted (e.g. the ~N opinion events per week, which no analysis reads back)
+        # DROP: the event is neither stored nor counted
+#
+# By default the columns grow as needed. If a spill path is given, the columns instead hold at most `chunk` rows in memory:
+# whenever they fill up, they are written to disk as <spill>_00000.npz, <spill>_00001.npz, etc. and emptied, so long runs
+# stay within a fixed amount of RAM. Reading a column back (column() or select()) joins the spilled chunks and the rows in memory.
+
+KEEP = 0
+COUNT = 1
+DROP = 2
+
+# keeps only the events read by the post-run analysis (transmissions and opinion changes), counting everything else
+ANALYSIS = {ev.TRANS: KEEP, ev.OP_CHANGE: KEEP}
+
+COLUMNS = (('time', np.int64), ('type', np.int8), ('node', np.int32), ('primary', np.int32))   # names and types of each column
+
+
+class EventLog:
+    def __init__(self, retention=None, default=KEEP, chunk=65536, spill=None):
+        # retention policy for each event type (indexed by type code), using the default for any type not given
+        self.retention = [default]*len(ev.NAMES)
+        if retention is not None:
+            for type, policy in retention.items():
+                self.retention[type] = policy
+
+        self.chunk = chunk   # number of rows held in memory before growing (or spilling to disk)
+        self.spill = spill   # path prefix for spilled chunks (None keeps everything in memory)
+        self.spilled = []   # filenames of the chunks written to disk so far
+        self.spilled_rows = 0   # number of rows written to disk so far
+
+        self.columns = {name: np.empty(chunk, dtype=dtype) for name, dtype in COLUMNS}   # the rows held in memory
+        self.size = 0   # number of rows currently held in memory
+        self.counts = {}   # running totals for each event type code (and any tallied outcomes, keyed by name)
+
+    # returns the number of stored events (in memory and on disk)
+    def __len__(self):
+        return self.spilled_rows+self.size
+
+    # stores an event in the log according to its type's retention policy
+    def append(self, event):
+        policy = self.retention[event.type]
+        if policy==DROP:
+            return
+        self.counts[event.type] = self.counts.get(event.type, 0) + 1
+        if policy==COUNT:
+            return
+
+        if self.size==len(self.columns['time']):
+            if self.spill is None:
+                self.grow()
+            else:
+                self.write_chunk()
+
+        row = self.size
+        self.columns['time'][row] = event.time
+        self.columns['type'][row] = event.type
+        self.columns['node'][row] = event.node
+        self.columns['primary'][row] = event.primary
+        self.size+=1
+
+    # adds to the running total of an outcome without storing an event
+    def tally(self, name, amount=1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    # returns the running total for an event type or tallied outcome
+    def count(self, name):
+        return self.counts.get(name, 0)
+
+    # returns every stored value of one column (time, type, node or primary), in the order the events were processed
+    def column(self, name):
+        parts = []
+        for filename in self.spilled:
+            with np.load(filename) as chunk:
+                parts.append(chunk[name])
+        parts.append(self.columns[name][:self.size])
+        return np.concatenate(parts)
+
+    # returns all four columns for the stored events of one type, as a dictionary of arrays
+    def select(self, type):
+        mask = self.column('type')==type
+        return {name: self.column(name)[mask] for name, dtype in COLUMNS}
+
+    # doubles the number of rows that can be held in memory
+    def grow(self):
+        for name, dtype in COLUMNS:
+            grown = np.empty(2*len(self.columns[name]), dtype=dtype)
+            grown[:self.size] = self.columns[name][:self.size]
+            self.columns[name] = grown
+
+    # writes the rows held in memory to the next chunk file and empties the columns
+    def write_chunk(self):
+        filename = self.spill+"_"+str(len(self.spilled)).zfill(5)+".npz"
+        np.savez(filename, **{name: self.columns[name][:self.size] for name, dtype in COLUMNS})
+        self.spilled.append(filename)
+        self.spilled_rows+=self.size
+        self.size = 0
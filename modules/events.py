@@ -0,0 +1,39 @@
+# ------ EVENTS NOTES ------
+# A single event representation shared by every module (this replaces the separate Event() dictionaries that used to live in
+# main.py, covid_game.py, vaccination.py and voter_model.py).
+# Event types are small integer codes rather than strings, and each event is a __slots__ object with five fields:
+        # type: the type of event which occurs (one of the codes below)
+        # time: the time (in seconds) that the event occurs
+        # node: the node that the event happens to (for a transmission, this is the node being infected)
+        # primary: for a transmission, the node that is doing the infecting (NONE for patient zeros and other event types)
+        # stamp: for immunity expiry events, the node's immunity epoch when the event was scheduled (see scheduler.py), otherwise 0
+
+# event type codes
+TRANS = 0   # transmission from primary to node
+RESUSCEPTIBLE = 1   # post-infection immunity wearing off
+VAX = 2   # vaccination offer
+UNVAX = 3   # post-vaccination immunity wearing off
+OPINION = 4   # opinion inheritance
+KILL = 5   # cuts the simulation short
+OP_CHANGE = 6   # an opinion change (only ever stored in the events log)
+CAMPAIGN = 7   # releases the next batch of yearly vaccination re-offers (see vaccination.py)
+COHORT = 8   # offers vaccination to a whole day's cohort of nodes (node is the cohort's number, see vaccination.py)
+SWEEP = 9   # updates every node's opinion at once (the synchronous voter model, see voter_model.py)
+
+NAMES = ('trans', 'resusceptible', 'vax', 'unvax', 'opinion', 'kill', 'op_change', 'campaign', 'cohort', 'sweep')   # names of each type, indexed by code
+
+NONE = -1   # placeholder for "no node" (e.g. the unknown primary of a patient zero)
+
+
+class Event:
+    __slots__ = ('type', 'time', 'node', 'primary', 'stamp')
+
+    def __init__(self, type, time, node, primary=NONE):
+        self.type = type
+        self.time = time
+        self.node = node
+        self.primary = primary
+        self.stamp = 0
+
+    def __repr__(self):
+        return "Event("+NAMES[self.type]+", time="+str(self.time)+", node="+str(self.node)+", primary="+str(self.primary)+")"
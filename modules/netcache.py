@@ -0,0 +1,108 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+
+from modules import network as nw
+
+
+# ------ NETWORK CACHE NOTES ------
+# Building a large network takes far longer than anything else before a run starts, but sweeps over anti-vax fractions or
+# vaccine parameters use the same network every time. A NetworkCache saves each network it builds in its own folder, named
+# after the parameters it was built from (N1, N2, N3, factor, seed and the network.py VERSION), and loads it back the next
+# time the same network is asked for.
+# Each network is stored as plain .npy files (the CSR arrays of both layers, plus the ring boundaries [0, N1, N1+N2, N]) rather
+# than one .npz archive, because NumPy can only memory-map .npy files: loading with mmap_mode='r' means the arrays are read
+# straight from disk as they are used, without copying the whole network into memory.
+# The cache is kept to a maximum number of networks (and optionally a maximum size on disk) by deleting the least recently
+# used networks first. Networks built without a seed are random every time, so they are never cached.
+
+FILES = ('indptr', 'indices', 'bindptr', 'bindices', 'bounds')   # the arrays saved for each network
+
+
+class NetworkCache:
+    def __init__(self, directory, max_entries=8, max_bytes=None):
+        self.directory = directory   # the folder holding one sub-folder per saved network
+        self.max_entries = max_entries   # the most networks to keep on disk
+        self.max_bytes = max_bytes   # the most disk space (in bytes) to use, or None for no limit
+        os.makedirs(directory, exist_ok=True)
+
+    # returns the folder name for a network's parameters
+    def key(self, N1, N2, N3, factor, seed):
+        return str(N1)+"_"+str(N2)+"_"+str(N3)+"_"+str(factor)+"_"+str(seed)+"_v"+str(nw.VERSION)
+
+    # returns the path of a network's folder
+    def path(self, N1, N2, N3, factor, seed):
+        return os.path.join(self.directory, self.key(N1, N2, N3, factor, seed))
+
+    # returns a saved network as (nodes, neighbours, bneighbours), memory-mapped from disk, or None if it isn't saved
+    def load(self, N1, N2, N3, factor, seed):
+        path = self.path(N1, N2, N3, factor, seed)
+        if seed is None or os.path.isdir(path)==False:
+            return None
+
+        arrays = {name: np.load(os.path.join(path, name+".npy"), mmap_mode='r') for name in FILES}
+        if arrays['bounds'].tolist() != [0, N1, N1+N2, N1+N2+N3]:   # a saved network must have the same rings
+            return None
+
+        os.utime(path)   # marks the network as recently used
+        nodes = list(range(N1+N2+N3))
+        return nodes, nw.CSR(arrays['indptr'], arrays['indices']), nw.CSR(arrays['bindptr'], arrays['bindices'])
+
+    # saves a network's CSR layers (and the ring boundaries), then evicts old networks if the cache is too big
+    def save(self, N1, N2, N3, factor, seed, neighbours, bneighbours):
+        path = self.path(N1, N2, N3, factor, seed)
+        temporary = tempfile.mkdtemp(dir=self.directory, suffix=".tmp")   # written here first (a folder of its own for each writer), so a half-written network is never loaded
+
+        arrays = {'indptr': neighbours.indptr, 'indices': neighbours.indices, 'bindptr': bneighbours.indptr,
+                  'bindices': bneighbours.indices, 'bounds': np.array([0, N1, N1+N2, N1+N2+N3], dtype=np.int64)}
+        for name in FILES:
+            np.save(os.path.join(temporary, name+".npy"), arrays[name])
+        with open(os.path.join(temporary, "parameters.json"), "w") as file:   # a readable record of what the network is
+            json.dump({'N1': N1, 'N2': N2, 'N3': N3, 'factor': factor, 'seed': seed, 'version': nw.VERSION}, file)
+
+        # another process may have saved the same network in the meantime, in which case its copy is kept and this one discarded
+        try:
+            os.replace(temporary, path)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+            if os.path.isdir(path)==False:
+                raise
+        self.evict(keep=path)
+
+    # returns a network from the cache, building (and saving) it first if it isn't there
+    def get(self, N1, N2, N3, factor, seed=None):
+        network = self.load(N1, N2, N3, factor, seed)
+        if network is not None:
+            return network
+
+        nodes, neighbours, bneighbours = nw.MakeNetworks(N1, N2, N3, factor, csr=True, rng=np.random.default_rng(seed))
+        if seed is not None:
+            self.save(N1, N2, N3, factor, seed, neighbours, bneighbours)
+        return nodes, neighbours, bneighbours
+
+    # returns the saved networks' folders, least recently used first
+    def entries(self):
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".tmp")==False]
+        paths = [path for path in paths if os.path.isdir(path)]
+        return sorted(paths, key=os.path.getmtime)
+
+    # deletes the least recently used networks until the cache is within its limits (never deleting the network at `keep`)
+    def evict(self, keep=None):
+        paths = [path for path in self.entries() if path!=keep]
+        sizes = {path: sum(entry.stat().st_size for entry in os.scandir(path)) for path in paths}
+        total = sum(sizes.values()) + (sum(entry.stat().st_size for entry in os.scandir(keep)) if keep is not None else 0)
+        count = len(paths) + (1 if keep is not None else 0)
+
+        for path in paths:
+            if count<=self.max_entries and (self.max_bytes is None or total<=self.max_bytes):
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= sizes[path]
+            count -= 1
+
+    # deletes every saved network
+    def clear(self):
+        for path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
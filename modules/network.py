@@ -1,138 +1,196 @@
 import numpy as np
-import copy
 
-def CreateRing(start, N, number):
+
+VERSION = 2   # increase whenever MakeNetworks builds a different network from the same seed (saved networks are keyed on this)
+
+
+# returns the edges of a ring lattice of the nodes start to N-1, where each node is linked to the next `number` nodes around
+# the ring, as an (edges x 2) array (built in one go with NumPy, wrapping around the ring with the modular function)
+def RingEdges(start, N, number):
     nodes=np.arange(start,N,1)
-    # make a list of edges (nodes are connected to those that are close to them)
-    edges=[]
-    for i in nodes:
-        # for each node i, make two (3-1=2) new edges
-        for j in range(1,number+1):
-            j=((i+j)%N)   # use the modular function (% in python) to wrap network around
-            if j==0 or j==1:
-                if start!=0:
-                    j=j+start
-            edges.append((i,j))   # add the edge to the list
-
-    neighbours={}
-    for node in nodes:
-        neighbours[node]=[]
-
-    # add the network neighbours of each node
-    for i,j in edges:
-        neighbours[i].append(j)   # add j to i's neighbours 
-        neighbours[j].append(i)   # add i to j's neighbours
-
-    return nodes, neighbours
-
-
-def SmallWorld(neighbours, number, elderly):
-    # creates "working copy" of the neighbours dict
-    bneighbours = copy.deepcopy(neighbours)
-    keys = list(neighbours.keys())   # fetches a list of the nodes from the dictionary
-
-    # picks SWLs twice: first for physical neighbours, then behavioural neighbours
-    for x in range(2):
-        for i in range(int(len(neighbours)*number[x])):
-            pick1, pick2 = np.random.choice(keys, size=2)   # chooses two nodes at random
-
-            # if picking for physical network...
-            if x==0:
-                while (pick2 in neighbours[pick1]):
-                    pick1, pick2 = np.random.choice(keys, size=2)   # keep choosing if they are already neighbours
-            elif x==1:
-                while (pick2 in bneighbours[pick1]):
-                    pick1, pick2 = np.random.choice(keys, size=2)   # keep choosing if they are already behavioural neighbours
-
-            # if picking for physical network...
-            if x == 0:
-                # adds small world links to the list of neighbours
-                neighbours[pick1].append(pick2)
-                neighbours[pick2].append(pick1)
-
-                # for the elderly special case, where there are no ring links but some contacts still need to be both physical and behavioural...
-                if elderly==True:
-                    if np.random.uniform(0.0,1.0)<0.5:   # make 50% of the physical links also be behavioural
-                        bneighbours[pick1].append(pick2)
-                        bneighbours[pick2].append(pick1)
-
-            # if picking for behaviour network....
-            else:
-                # adds small world links to the list of neighbours
-                bneighbours[pick1].append(pick2)
-                bneighbours[pick2].append(pick1)
-
-    return neighbours, bneighbours
-
-
-def LinkRings(nbrs1, nbrs2, bnbrs1, bnbrs2, n, directional):
-    # picking links for physical network...
-    for i in range(int(n[0]*len(nbrs1))):
-        node1 = np.random.choice(list(nbrs1.keys()))
-        node2 = np.random.choice(list(nbrs2.keys()))
-
-        # adds link to the list of neighbours
-        nbrs1[node1].append(node2)
-        nbrs2[node2].append(node1)
-
-        if np.random.uniform(0,1)<0.5:   # make 50% of the physical links also be behavioural
-            if directional!=True:   # the first ring passed is always the younger, so if the links are directional then don't add this neighbour
-                bnbrs1[node1].append(node2)
-            bnbrs2[node2].append(node1)
-
-
-    # picking links for the behavioural network...
-    for i in range(int(n[1]*len(bnbrs1))):
-        node1 = np.random.choice(list(bnbrs1.keys()))
-        node2 = np.random.choice(list(bnbrs2.keys()))
-
-        # if the link already in the physical network or the behavioural network, pick again
-        while (node2 in nbrs1[node1]) or (node2 in bnbrs1[node1]):
-            node1 = np.random.choice(list(bnbrs1.keys()))
-            node2 = np.random.choice(list(bnbrs2.keys()))
-            
-        # adds link to the list of neighbours
-        if directional!=True:   # the first ring passed is always the younger, so if the links are directional then don't add this neighbour
-            bnbrs1[node1].append(node2)
-        bnbrs2[node2].append(node1)
-
-    return nbrs1, nbrs2, bnbrs1, bnbrs2
-
-
-def MakeNetworks(N1, N2, N3, factor):
+    offsets=np.arange(1,number+1,1)   # how far around the ring each of a node's new edges reaches
+    targets=start+((nodes[:,None]-start+offsets[None,:])%(N-start))   # wraps around the ring (rather than the whole network)
+    return np.column_stack((np.repeat(nodes,number), targets.ravel()))
+
+
+# returns a key for each undirected edge (the same key whichever way round the edge is given), for checking edges against each other
+def EdgeKeys(edges, N):
+    edges=np.asarray(edges, dtype=np.int64).reshape(-1,2)
+    return np.minimum(edges[:,0],edges[:,1])*N + np.maximum(edges[:,0],edges[:,1])
+
+
+# returns how many distinct links (without self-loops) between the nodes in range1 and range2 are not already in existing_keys.
+# The two ranges are either the same ring or separate rings
+def FreePairs(range1, range2, existing_keys, N):
+    existing_keys=np.asarray(existing_keys, dtype=np.int64)
+    low, high = existing_keys//N, existing_keys%N   # the nodes of each existing link (smallest first)
+    if tuple(range1)==tuple(range2):
+        count=range1[1]-range1[0]
+        pairs=count*(count-1)//2
+        inside=(low>=range1[0])&(high<range1[1])
+    else:
+        pairs=(range1[1]-range1[0])*(range2[1]-range2[0])
+        (a, b), (c, d) = sorted((tuple(range1), tuple(range2)))   # the earlier ring holds the smaller node of each link
+        inside=(low>=a)&(low<b)&(high>=c)&(high<d)
+    return pairs-np.count_nonzero(inside)
+
+
+# picks `number` random links from the nodes in range1 to the nodes in range2 (each a (start, stop) pair) in vectorised batches,
+# rejecting self-loops, links already in the sorted array existing_keys (see EdgeKeys) and repeats within the new links; only
+# the rejected fraction is picked again. A small ring may not have `number` free pairs left, in which case every free pair is linked
+def Shortcuts(range1, range2, number, existing_keys, N, rng):
+    keys=existing_keys   # sorted keys of every link so far (existing and new)
+    links=[]
+    remaining=min(number, FreePairs(range1, range2, existing_keys, N))
+    while remaining>0:
+        picks=np.column_stack((rng.integers(range1[0], range1[1], size=remaining), rng.integers(range2[0], range2[1], size=remaining)))   # chooses pairs of nodes at random
+        pick_keys=EdgeKeys(picks, N)
+
+        # rejects self-loops, then repeats within this batch (keeping the first of each, with the keys now sorted)
+        index=np.flatnonzero(picks[:,0]!=picks[:,1])
+        unique_keys, first = np.unique(pick_keys[index], return_index=True)
+
+        # rejects links that already exist
+        if len(keys)>0:
+            position=np.minimum(np.searchsorted(keys, unique_keys), len(keys)-1)
+            new=keys[position]!=unique_keys
+            unique_keys, first = unique_keys[new], first[new]
+
+        index=np.sort(index[first])   # puts the accepted links back in the order they were picked
+        links.append(picks[index])
+        keys=np.sort(np.concatenate((keys, unique_keys)), kind='stable')
+        remaining-=len(index)
+
+    return np.concatenate(links) if links else np.zeros((0,2), dtype=np.int64)
+
+
+# adds small world links to a ring's edges, returning the ring's physical and behavioural edges
+def SmallWorld(start, stop, edges, number, elderly, N, rng):
+    count=stop-start   # number of nodes in the ring
+
+    # picking small world links for the physical network (the ring links are both physical and behavioural)...
+    physical=Shortcuts((start, stop), (start, stop), int(count*number[0]), np.unique(EdgeKeys(edges, N)), N, rng)
+    bedges=edges
+
+    # for the elderly special case, where there are no ring links but some contacts still need to be both physical and behavioural...
+    if elderly==True:
+        also=rng.random(len(physical))<0.5   # make 50% of the physical links also be behavioural
+        bedges=np.concatenate((bedges, physical[also]))
+
+    # picking small world links for the behavioural network (which can't repeat existing behavioural links)...
+    behavioural=Shortcuts((start, stop), (start, stop), int(count*number[1]), np.unique(EdgeKeys(bedges, N)), N, rng)
+
+    return np.concatenate((edges, physical)), np.concatenate((bedges, behavioural))
+
+
+# links two rings (the nodes start1 to stop1-1 and start2 to stop2-1), returning the physical and behavioural links as arrays with
+# the first ring's node in column 0 (number is the amount of links per node of the first ring, e.g. [3.4, 2.3] is 3.4*N1
+# physical links and 2.3*N1 behavioural links)
+def LinkRings(start1, stop1, start2, stop2, number, N, rng):
+    count=stop1-start1   # number of nodes in the first ring
+
+    # picking links for the physical network (these can repeat, as in the ring-by-ring version)...
+    physical=np.column_stack((rng.integers(start1, stop1, size=int(number[0]*count)), rng.integers(start2, stop2, size=int(number[0]*count))))
+    also=physical[rng.random(len(physical))<0.5]   # make 50% of the physical links also be behavioural
+
+    # picking links for the behavioural network (which can't repeat a link already in the physical or behavioural network)...
+    behavioural=Shortcuts((start1, stop1), (start2, stop2), int(number[1]*count), np.unique(EdgeKeys(physical, N)), N, rng)
+
+    return physical, np.concatenate((also, behavioural))
+
+
+# ------ CSR NOTES ------
+# A network layer can also be stored in compressed sparse row (CSR) form: every node's neighbours are laid end to end in one
+# `indices` array, and node i's neighbours are indices[indptr[i]:indptr[i+1]]. This takes 4 bytes per edge (rather than the
+# ~100 bytes of a dictionary of Python lists), and looking up a node's neighbours is just a slice.
+
+class CSR:
+    def __init__(self, indptr, indices, degree=None):
+        self.indptr = indptr   # where each node's neighbours start (and end) in indices
+        self.indices = indices   # every node's neighbours, one node after another
+        self.degree = degree if degree is not None else np.diff(indptr).astype(np.int32)   # how many neighbours each node has
+
+    def __len__(self):
+        return len(self.indptr)-1
+
+    # returns a node's neighbours as a slice of the indices array
+    def __getitem__(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node+1]]
+
+
+# returns the smallest integer type that can hold values up to n (int32 unless the network is enormous)
+def IndexType(n):
+    return np.int32 if n<np.iinfo(np.int32).max else np.int64
+
+
+# builds a CSR network of N nodes from arrays of directed links, where each target is added to its source's neighbours
+def EdgesToCSR(sources, targets, N):
+    sources=np.asarray(sources, dtype=np.int64)
+    order=np.argsort(sources, kind='stable')   # groups the links by source node (keeping the order they were made in)
+
+    indptr = np.zeros(N+1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=N), out=indptr[1:])
+    indptr = indptr.astype(IndexType(indptr[-1]))
+
+    indices = np.asarray(targets)[order].astype(IndexType(N))
+    return CSR(indptr, indices)
+
+
+# converts lists of edge arrays into CSR form: `edges` link both ways, while `oneway` edges only add column 1 to column 0's neighbours
+def ToCSR(edges, N, oneway=()):
+    edges=np.concatenate(edges)
+    oneway=np.concatenate(oneway) if len(oneway)>0 else np.zeros((0,2), dtype=np.int64)
+    sources=np.concatenate((edges[:,0], edges[:,1], oneway[:,0]))
+    targets=np.concatenate((edges[:,1], edges[:,0], oneway[:,1]))
+    return EdgesToCSR(sources, targets, N)
+
+
+# converts a CSR network into a dictionary of each node's neighbours as a NumPy array (the older, non-CSR format)
+def ToArrays(network):
+    return {node: network[node].astype(np.int64) for node in range(len(network))}
+
+
+def MakeNetworks(N1, N2, N3, factor, csr=False, rng=None):
 
     ################################ MAKING BASIC NODE NETWORK ################################
 
+    N=N1+N2+N3
+    if rng is None:
+        rng=np.random.default_rng()
+
     # create the three (currently unattached) rings of nodes, plus the universal ring links
-    nodes1, neighbours1 = CreateRing(0, N1, 1)   # this provides 2 disease links, 2 behavioural links
-    nodes2, neighbours2 = CreateRing(N1, N1+N2, 1)   # this provides 2 disease links, 2 behavioural links
-    nodes3, neighbours3 = CreateRing(N1+N2, N1+N2+N3,0)   # R3 has no systematic ring links, only random small world links
+    nodes1, edges1 = np.arange(0,N1,1), RingEdges(0, N1, 1)   # this provides 2 disease links, 2 behavioural links
+    nodes2, edges2 = np.arange(N1,N1+N2,1), RingEdges(N1, N1+N2, 1)   # this provides 2 disease links, 2 behavioural links
+    nodes3, edges3 = np.arange(N1+N2,N,1), RingEdges(N1+N2, N, 0)   # R3 has no systematic ring links, only random small world links
 
     ################################# ADDING SMALL WORLD LINKS ################################
 
     # adds small world links for disease and behavioural networks (boolean is for the elderly special case)
-    neighbours1, bneighbours1 = SmallWorld(neighbours1, [(3.9*factor)-2, 0.9], False)   # this provides an additional 1.9 disease links, 0.9 behavioural links
-    neighbours2, bneighbours2 = SmallWorld(neighbours2, [(3.5*factor)-2, 3.7], False)   # this provides an additional 1.5 disease links, 3.7 behavioural links
-    neighbours3, bneighbours3 = SmallWorld(neighbours3, [(0.9*factor), 0.9], True)   # this provides an additional 0.9 disease links, 0.9 behavioural links
+    edges1, bedges1 = SmallWorld(0, N1, edges1, [(3.9*factor)-2, 0.9], False, N, rng)   # this provides an additional 1.9 disease links, 0.9 behavioural links
+    edges2, bedges2 = SmallWorld(N1, N1+N2, edges2, [(3.5*factor)-2, 3.7], False, N, rng)   # this provides an additional 1.5 disease links, 3.7 behavioural links
+    edges3, bedges3 = SmallWorld(N1+N2, N, edges3, [(0.9*factor), 0.9], True, N, rng)   # this provides an additional 0.9 disease links, 0.9 behavioural links
 
 
     ################################# ADDING INTER-RING LINKS ################################
 
-    # link the three rings (number is the amount of links per node of the first set of nodes passed, e.g. R1 has 3.4*N1 physical links to R2)
-    neighbours1, neighbours2, bneighbours1, bneighbours2 = LinkRings(neighbours1, neighbours2, bneighbours1, bneighbours2, [3.4*factor, 2.3], True)
-    neighbours2, neighbours3, bneighbours2, bneighbours3 = LinkRings(neighbours2, neighbours3, bneighbours2, bneighbours3, [0.3*factor, 0.3], False)
-    neighbours1, neighbours3, bneighbours1, bneighbours3 = LinkRings(neighbours1, neighbours3, bneighbours1, bneighbours3, [0.1*factor, 0.2], True)
+    # link the three rings (number is the amount of links per node of the first ring passed, e.g. R1 has 3.4*N1 physical links to R2)
+    edges12, bedges12 = LinkRings(0, N1, N1, N1+N2, [3.4*factor, 2.3], N, rng)
+    edges23, bedges23 = LinkRings(N1, N1+N2, N1+N2, N, [0.3*factor, 0.3], N, rng)
+    edges13, bedges13 = LinkRings(0, N1, N1+N2, N, [0.1*factor, 0.2], N, rng)
 
     ####################################### MERGING INFO #####################################
 
-    # merge individual rings' information into definitive lists
+    # merge individual rings' edges into definitive CSR arrays (or dictionaries of arrays, if CSR isn't requested)
+    # the R1-R2 and R1-R3 behavioural links are directional: the older node takes the child as a behavioural neighbour, but not vice versa
     nodes = np.ndarray.tolist(nodes1) + np.ndarray.tolist(nodes2) + np.ndarray.tolist(nodes3)
-    neighbours = neighbours1 | neighbours2 | neighbours3
-    bneighbours = bneighbours1 | bneighbours2 | bneighbours3
+    neighbours = ToCSR([edges1, edges2, edges3, edges12, edges23, edges13], N)
+    bneighbours = ToCSR([bedges1, bedges2, bedges3, bedges23], N, oneway=[bedges12[:,::-1], bedges13[:,::-1]])
+    if csr!=True:
+        neighbours, bneighbours = ToArrays(neighbours), ToArrays(bneighbours)
 
     # check results:
     #for node in neighbours:
         #print(node,'is physically connected to   ',neighbours[node])
         #print(node,'is behaviourally connected to',bneighbours[node])
     
-    return nodes, neighbours, bneighbours
\ No newline at end of file
+    return nodes, neighbours, bneighbours
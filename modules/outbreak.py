@@ -0,0 +1,336 @@
+import numpy as np
+
+from modules import events as ev
+from modules import render as rd
+from modules import network as nw
+from modules import netcache as nc
+from modules import scheduler as sch
+from modules import eventlog as el
+from modules import activecases as ac
+from modules import sampler as sp
+from modules import severity as sev
+from modules import transmission as tm
+from modules import vaccination as vax
+from modules import voter_model as vm
+
+
+# ------ OUTBREAK NOTES ------
+# One replicate of the main.py simulation (a single outbreak on an existing network), taken out of main.py so that it can be
+# run by the interactive scripts (main.py and covid_game.py, which only sets different parameters), or many times over in
+# worker processes (see ensemble.py).
+# A replicate is described by a dictionary of parameters (see DEFAULTS, which are the values main.py has always used), runs
+# on the CSR networks from network.py with its own numpy random generator, and returns a dictionary of results:
+        # outbreak_size: the number of transmissions (including those to immune nodes, as in the original outbreak size data)
+        # infected: the number of actual infections
+        # endemic: whether the outbreak was still going when it was cut short (after kill_time)
+        # last_infection: the time (in seconds) of the final transmission
+        # ring_cases: the number of infections in each age ring (children, adults, elderly)
+        # ring_peaks: the most active cases (cases started within time_period) there were at once in each age ring
+        # vaccinated, refused, op_changes: how many vaccinations, refusals and opinion changes there were
+# Events are only counted by default, so memory use doesn't grow with the length of the run. To keep events for analysis
+# afterwards, pass in an EventLog (e.g. EventLog(el.ANALYSIS, default=el.COUNT, spill='opinion_log') keeps every transmission
+# and opinion change, spilling them to disk) and read it back once Simulate returns.
+# RunOutbreak(config) does everything from a single config dictionary (building the network as well), with no terminal input
+# or output at all, for scripts, sweeps and benchmarks (run.py is the command line version).
+
+DEFAULTS = {
+    'N1': 190, 'N2': 625, 'N3': 185,   # number of children, adults and elderly people
+    'factor': 3,   # POLYMOD multiplication factor for daily contacts (to make figures weekly)
+    'av_frac': 0.25,   # the fraction of voters who are initialised to be anti-vax
+    'v_mode': 90,   # modal time (in days) that vaccination is effective for
+    'seed_no': 5,   # number of patient zeros
+    'R0': 1.3,   # basic reproduction number (beta * avg. neighbours = R0)
+    'time_period': 7*24*60*60,   # the amount of time to count 'recent' cases (default is 1 week)
+    'g_mode': 5, 'g_dispersion': 1.3,   # lognormal distribution of generation times (in days)
+    'c_mode': 20,   # modal post-disease immunity time (in days)
+    'c_dispersion': None,   # dispersion of post-disease immunity times (None uses c_mode/12)
+    'severity': [(0.2, 0.6), (0.6, 0.6), (1.1, 0.5)],   # (mu, sigma) of each age ring's case severity distribution
+    'opiniontime': 7*24*60*60,   # time between each node's opinion events
+    'opinion_mode': 'async',   # 'async' (every node has its own opinion events) or 'sync' (every node is updated at once, see voter_model.py)
+    'opinion_blocks': 1,   # in 'sync' mode, the number of random blocks the nodes are updated in, one after another
+    'kill_time': 5*365*24*60*60,   # cuts the simulation short at 5 years
+    'vaccination': 'log_dist',   # the vaccination scheme: 'log_dist', 'age_wave', 'waves' or 'random' (see vaccination.py)
+    'waves': vax.AGE_WAVES,   # the waves offered vaccination by the 'waves' scheme (start day, ring, coverage and lognormal shape)
+    'vax_wait': 40,   # days before the 'random' vaccination scheme begins
+    'reoffer': 'campaign',   # how offers are scheduled: 'campaign' (a day at a time), 'cohort' (a day's offers processed together) or 'event' (one event per offer)
+    # legacy_waning = True restores the old waning scheduling (it doesn't reproduce the dissertation's results on its own, as nodes
+    # are now offered vaccination differently): post-infection immunity expiry is scheduled for every transmission attempt
+    # (rather than each actual infection), vaccine expiry is scheduled for every offer (even refusals), and older expiry events
+    # are never superseded by newer ones
+    'legacy_waning': False,
+}
+
+SETTINGS = ('seed', 'network_seed', 'cache')   # the settings a RunOutbreak config can have besides the parameters in DEFAULTS
+
+# the allowed values of each parameter which chooses between schemes (anything else is rejected rather than running the default)
+CHOICES = {
+    'vaccination': ('log_dist', 'age_wave', 'waves', 'random'),
+    'reoffer': ('campaign', 'cohort', 'event'),
+    'opinion_mode': ('async', 'sync'),
+}
+
+
+# function to calculate lognormal distribution from mode and dispersion
+def LogNormal(mode, dispersion):
+    sigma=np.log(dispersion)
+    mu=(sigma**2)+np.log(mode)
+    return abs(sigma), abs(mu)
+
+
+# returns a full set of parameters, with any that aren't given taken from DEFAULTS (rejecting any unknown names or schemes, see Check)
+def Parameters(params=None):
+    full = dict(DEFAULTS)
+    full.update(params or {})
+    Check(full)
+    return full
+
+
+# creates a SamplerPool with every distribution a replicate draws from (see sampler.py)
+def MakePool(params, rng):
+    g_sigma, g_mu = LogNormal(params['g_mode'], params['g_dispersion'])
+    c_dispersion = params['c_dispersion'] if params['c_dispersion'] is not None else params['c_mode']/12
+    c_sigma, c_mu = LogNormal(params['c_mode'], c_dispersion)
+    v_sigma, v_mu = LogNormal(params['v_mode'], params['v_mode']/12)
+
+    pool = sp.SamplerPool(rng)
+    pool.lognormal('generation', g_mu, g_sigma)   # generation times
+    pool.lognormal('post_infection', c_mu, c_sigma)   # post-infection immunity times
+    pool.lognormal('vaccine', v_mu, v_sigma)   # post-vaccination immunity times
+    sev.AddStreams(pool, params['severity'])   # case severities (truncated at 1) for each age ring
+    pool.uniform('uniform')   # rolls for transmissions and opinion changes
+    return pool
+
+
+# runs one outbreak on the given networks, returning a dictionary of results (output_type is 'list', 'table' or 'none', or a
+# Renderer can be passed in to control how often the output is written). An EventLog can also be passed in to keep events,
+# and the patient zeros can be chosen beforehand (otherwise seed_no of them are chosen at random)
+def Simulate(params, neighbours, bneighbours, rng=None, output_type='none', renderer=None, eventslog=None, patients_zero=None):
+    params = Parameters(params)
+    N1, N2, N3 = params['N1'], params['N2'], params['N3']
+    totalN = N1+N2+N3
+    opiniontime = params['opiniontime']
+    legacy_waning = params['legacy_waning']
+
+    rng = rng if rng is not None else np.random.default_rng()
+    pool = MakePool(params, rng)   # random numbers are drawn in blocks from named distributions, rather than one at a time
+    beta = params['R0']/np.mean(neighbours.degree)
+
+    ################################ STATUS ARRAYS ################################
+
+    patients_zero = patients_zero if patients_zero is not None else rng.choice(totalN, size=params['seed_no'])   # chooses patient zeros
+    immune=np.zeros(totalN, dtype=bool)   # an array telling us the immunity of each node (for initial conditions we start with all nodes susceptible)
+    active_vax=np.zeros(totalN, dtype=bool)   # an array telling us whether vaccination is active on each node
+
+    opinions = vm.InitBehaviour(totalN, params['av_frac'], pool)   # randomly initialises opinions (zero is anti-vax, 1 is pro-vax)
+
+    severity=np.zeros(totalN)   # an array keeping track of everyone's most severe case of disease
+    ring=sev.RingArray(N1, N2, N3)   # an array telling us the age ring of each node (0 is children, 1 is adults, 2 is elderly)
+    case_recurrences=np.zeros(totalN, dtype=np.int64)   # an array storing how many cases each node has had
+
+    ######################### CREATING PRE-DETERMINED EVENTS #########################
+
+    events=sch.Scheduler()   # create a queue of events (this queue will grow and shrink over time)
+    eventslog = eventslog if eventslog is not None else el.EventLog(default=el.COUNT)   # running totals for every event type (none are stored unless a log is passed in)
+
+    # creates seeding events (transmissions at time t=0) and adds to events list
+    for i in range(len(patients_zero)):
+        events.append(ev.Event(ev.TRANS, 0, patients_zero[i]))
+
+    events.append(ev.Event(ev.KILL, params['kill_time'], ev.NONE))   # creates an event to cut the simulation short (optional)
+
+    # builds the schedule of first vaccination offers
+    if params['vaccination']=='random':
+        offer_times, offer_nodes = vax.RandomSchedule(1, totalN, rng, params['vax_wait'])   # chooses nodes to be vaccinated at a random time in the first year (after the wait)
+    elif params['vaccination']=='waves':
+        offer_times, offer_nodes = vax.WaveSchedule(params['waves'], N1, N2, N3, rng)   # offers vaccination in the given waves (see vaccination.py)
+    elif params['vaccination']=='age_wave':
+        offer_times, offer_nodes = vax.AgeWaveSchedule(1, N1, N2, N3, rng)   # chooses nodes to be vaccinated in age waves with lognormal time dists (similar to UK COVID vax rollout)
+    else:
+        offer_times, offer_nodes = vax.LogDistSchedule(1, totalN, rng)   # chooses random nodes to be vaccinated with lognormal time dists (similar to AgeWaveSchedule but without waves)
+
+    # every node is re-offered vaccination yearly: either by a campaign which only releases the next day's offers into the queue,
+    # by offering each day's cohort of nodes vaccination together (reoffer = 'cohort'), or (reoffer = 'event') by scheduling
+    # each node's next offer as its current one is processed
+    campaign = None
+    cohorts = None
+    if params['reoffer']=='campaign':
+        campaign = vax.YearlyOffers(offer_times, offer_nodes)
+        campaign.tick(events, 0)
+    elif params['reoffer']=='cohort':
+        cohorts = vax.Cohorts(offer_times, offer_nodes)
+        cohorts.start(events)
+    else:
+        events.schedule(ev.VAX, offer_times, offer_nodes)
+
+    # opinions are either updated by each node's own opinion events, or (opinion_mode = 'sync') all at once every opiniontime
+    if params['opinion_mode']=='sync':
+        events.append(ev.Event(ev.SWEEP, 0, ev.NONE))
+    else:
+        events = vm.GetOpinionEvents(N1, N2, N3, events, opiniontime, pool)   # fetches each node's initial opinion event (at a random time between t=0 and t=opiniontime)
+
+    active_cases = ac.ActiveCases(params['time_period'], ring)   # tracks the cases that started in the last time_period (typically a week)
+    lastinfection = 0
+    endemic = False
+
+    renderer = renderer if renderer is not None else rd.Renderer(output_type, N1, N2, N3)   # writes the table or list output (see render.py)
+    renderer.header()
+
+    ################################## SIMULATE OUTBREAK ##################################
+
+    # start a loop in which we resolve the events in time order until no events remain
+    while events:
+        event=events.pop()   # fetch (and remove) the earliest event in the queue
+        eventslog.append(event)   # permanently stores event in log
+
+        # if the selected event is a transmission...
+        if event.type==ev.TRANS:
+            # ignoring cases in which the secondary is already immune (so no infection occurs)...
+            if not immune[event.node]:
+                renderer.line('infected', event.time, event.node, event.primary)   # print the event
+                renderer.row(event.time, eventslog.count(ev.TRANS), len(active_cases), eventslog.count('vaccinated'), eventslog.count('refused'))
+
+                case_severity = pool.next(sev.STREAMS[ring[event.node]])   # draws a case severity (at most 1) for the node's age ring
+
+                # updates "most severe case" for node if necessary
+                if case_severity>severity[event.node]:
+                    severity[event.node]= case_severity
+
+                active_cases.add(event.time, event.node)   # adds the case to the active cases
+                eventslog.tally('infected')   # counts the infection (unlike ev.TRANS, this excludes transmissions to immune nodes)
+                case_recurrences[event.node]+=1   # adds a case to the node's total case count
+
+                # now we need to add more infections to the list...
+                primary=event.node   # "move on" so that the secondary becomes the new primary
+                immune[primary]=True   # make the primary immune so that no future events can affect that node
+
+                # generates a time for the post-infection immunity to wear off (superseding any earlier expiry event for the node)
+                if legacy_waning == False:
+                    resusceptible_time = sp.NewEventTime(event.time, pool, 'post_infection')
+                    events.expire(ev.Event(ev.RESUSCEPTIBLE, resusceptible_time, primary))
+
+                # create new infection events for all neighbours of the primary at once, and add them to the queue
+                tm.Infect(events, primary, event.time, neighbours[primary], immune, beta, pool, legacy_waning)
+
+            # if there are no more transmission events in the events list...
+            if events.pending(ev.TRANS)==0:
+                lastinfection = event.time   # store the time of the final transmission
+
+        # if the earliest remaining event is a vaccination...
+        elif event.type==ev.VAX:
+            if opinions[event.node] == 1:   # if the node is pro-vax (denoted 1)...
+                immune[event.node]=True   # makes the node immune
+                active_vax[event.node]=True   # marks the node as actively vaccinated
+                eventslog.tally('vaccinated')   # counts the vaccination
+
+                # generates a time for post-vaccination immunity to wear off (superseding the previous vaccine's or infection's expiry)
+                if legacy_waning == False:
+                    end_time = sp.NewEventTime(event.time, pool, 'vaccine')
+                    events.expire(ev.Event(ev.UNVAX, end_time, event.node))   # creates 'unvax' event and adds to the queue
+
+                renderer.line('vaccinated', event.time, event.node)
+                renderer.row(event.time, eventslog.count(ev.TRANS), len(active_cases), eventslog.count('vaccinated'), eventslog.count('refused'))
+
+            else:
+                eventslog.tally('refused')   # counts the refusal
+                renderer.line('refused', event.time, event.node)
+                renderer.row(event.time, eventslog.count(ev.TRANS), len(active_cases), eventslog.count('vaccinated'), eventslog.count('refused'))
+
+            # offers the node another vaccination in a year (unless the campaign is taking care of re-offers)
+            if campaign is None:
+                new_vax_time = event.time + (365*24*60*60)
+                events.append(ev.Event(ev.VAX, new_vax_time, event.node))
+
+            # in legacy mode, generates a time for post-vaccination immunity to wear off after every offer (even refusals)
+            if legacy_waning == True:
+                end_time = sp.NewEventTime(event.time, pool, 'vaccine')
+                events.append(ev.Event(ev.UNVAX, end_time, event.node))
+
+        elif event.type==ev.OPINION:
+            opinions[event.node], changeflag = vm.OpinionEvent(event.node, bneighbours[event.node], opinions, severity, pool)   # performs opinion inheritance
+            if changeflag == True:
+                eventslog.append(ev.Event(ev.OP_CHANGE, event.time, event.node))   # records the opinion change in the events log
+
+            events.append(ev.Event(ev.OPINION, event.time+opiniontime, event.node))   # creates the next opinion event for the node
+
+        elif event.type==ev.SWEEP:
+            changes = vm.SweepOpinions(bneighbours, opinions, severity, pool, params['opinion_blocks'])   # updates every node's opinion
+            eventslog.tally(ev.OP_CHANGE, changes)   # counts the opinion changes (without storing each one)
+            events.append(ev.Event(ev.SWEEP, event.time+opiniontime, ev.NONE))   # creates the next sweep
+
+        # if the earliest remaining event is a day's cohort of vaccinations, offer them all at once
+        elif event.type==ev.COHORT:
+            accepted, refused = cohorts.offer(event, opinions, immune, active_vax, events, pool, eventslog, legacy_waning)
+            if renderer.output_type=='list':
+                for node in accepted.tolist():
+                    renderer.line('vaccinated', event.time, node)
+                for node in refused.tolist():
+                    renderer.line('refused', event.time, node)
+            renderer.row(event.time, eventslog.count(ev.TRANS), len(active_cases), eventslog.count('vaccinated'), eventslog.count('refused'))
+
+        elif event.type==ev.CAMPAIGN:
+            campaign.tick(events, event.time)   # releases the next day's yearly vaccination offers
+
+        elif event.type==ev.UNVAX:
+            immune[event.node]=False   # node is no longer immune
+            active_vax[event.node]=False   # vaccination is no longer "active" for this node
+
+        elif event.type==ev.RESUSCEPTIBLE:
+            immune[event.node]=False   # node is no longer immune
+
+        # when the 'kill' event is reached, delete all future events and finish the simulation
+        elif event.type==ev.KILL:
+            if events.pending(ev.TRANS)!=0:
+                lastinfection=event.time
+                endemic=True   # the outbreak was still going, so it has likely become endemic
+            events.clear()
+
+        # removes events from recents if it is older than the specified time_period (typically a week)
+        active_cases.expire(event.time)
+
+        # kills the simulation early once there are no more transmissions to be performed
+        if events.pending(ev.TRANS)==0:
+            events.clear()
+
+    renderer.close()   # writes any output still waiting
+
+    return {'outbreak_size': eventslog.count(ev.TRANS), 'infected': eventslog.count('infected'), 'endemic': endemic,
+            'last_infection': lastinfection, 'ring_cases': np.bincount(ring, weights=case_recurrences, minlength=3).astype(np.int64),
+            'ring_peaks': np.array(active_cases.peak_counts(), dtype=np.int64),
+            'vaccinated': eventslog.count('vaccinated'), 'refused': eventslog.count('refused'), 'op_changes': eventslog.count(ev.OP_CHANGE)}
+
+
+# raises a ValueError for any unknown parameter name in a config dictionary, or any scheme not listed in CHOICES
+def Check(config):
+    for name in config:
+        if name not in DEFAULTS and name not in SETTINGS:
+            raise ValueError("Unknown outbreak parameter: "+str(name))
+    for name, allowed in CHOICES.items():
+        if name in config and config[name] not in allowed:
+            raise ValueError("Unknown value for outbreak parameter "+str(name)+": "+str(config[name])+" (expected one of "+", ".join(allowed)+")")
+
+
+# checks a config dictionary of parameters (see DEFAULTS) and settings, and builds its network: 'seed' seeds the whole run, and
+# with a 'network_seed' (and a 'cache' folder) the network is taken from the network cache instead. Returns the full
+# parameters, the run's random generator and the networks
+def Setup(config=None):
+    config = dict(config or {})
+    Check(config)
+
+    params = Parameters({name: value for name, value in config.items() if name in DEFAULTS})
+    rng = np.random.default_rng(config.get('seed'))
+    network_seed = config.get('network_seed')
+
+    if network_seed is not None and config.get('cache') is not None:
+        nodes, neighbours, bneighbours = nc.NetworkCache(config['cache']).get(params['N1'], params['N2'], params['N3'], params['factor'], network_seed)
+    else:
+        network_rng = rng if network_seed is None else np.random.default_rng(network_seed)
+        nodes, neighbours, bneighbours = nw.MakeNetworks(params['N1'], params['N2'], params['N3'], params['factor'], csr=True, rng=network_rng)
+
+    return params, rng, neighbours, bneighbours
+
+
+# runs a whole outbreak (building its network, then simulating it) from a config dictionary (see Setup), returning the results
+# dictionary from Simulate without any terminal input or output
+def RunOutbreak(config=None):
+    params, rng, neighbours, bneighbours = Setup(config)
+    return Simulate(params, neighbours, bneighbours, rng)
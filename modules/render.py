@@ -0,0 +1,164 @@
+import sys
+import time
+import queue
+import threading
+
+from modules import events as ev
+
+
+# ------ RENDER NOTES ------
+# The real-time terminal output used to print (and flush) a line for every transmission, vaccination and refusal, so for big
+# populations most of the simulation's time went on terminal output. A Renderer sits between the event loop and the terminal:
+        # table mode: the loop passes in the latest statistics after every event, but a row is only written once per simulated
+        # day (or `days` days), showing the statistics at the end of that day, or once every `seconds` of real time if that is
+        # given instead
+        # list mode: every event still gets a line, but lines are collected in a buffer and written together, whenever the
+        # buffer fills up or `seconds` of real time have passed
+# With threaded=True the formatting and writing happen on a separate thread, fed through a queue, so the event loop only ever
+# hands over a tuple and carries on. Call close() at the end of the simulation to write anything still waiting.
+# 'none' mode ignores everything.
+
+TABLE_HEADER = ("--------------------------------------------------------------------------\n"
+                "Time           Total cases     Active cases    Vaccinations     Refusals      \n"
+                "--------------------------------------------------------------------------\n")
+
+MESSAGES = {'infected': ("\U0001F9A0 ", " infected "), 'vaccinated': ("\U0001F489 ", " got vaccinated"), 'refused': ("\U0001F645 ", " refused the vaccine")}
+
+
+# colours the text output of node numbers (for list mode outputs)
+def NodeColour(node, N1, N2, N3):
+    if node == ev.NONE:   # the node that infected a patient zero is unknown
+        return '?'
+    elif int(node)<N1:
+        return "\033[91m"+str(node)+"\033[0m"   # if the node is a child, colour the text red
+    elif int(node)<N1+N2:
+        return "\033[93m"+str(node)+"\033[0m"   # if the node is an adult, colour the text yellow
+    else:
+        return "\033[92m"+str(node)+"\033[0m"   # if the node is elderly, colour the text green
+
+
+# function to convert time from seconds to days, hours etc for printing
+def ConvertTime(time):
+    day = time // (24 * 3600)
+    time = time % (24 * 3600)
+    hour = time // 3600
+    time %= 3600
+    minutes = time // 60
+    time %= 60
+    seconds = time
+    return str(day)+" days, "+str(hour)+" hours, "+str(minutes)+" minutes, and "+str(seconds)+" seconds"
+
+
+class Renderer:
+    def __init__(self, output_type, N1, N2, N3, days=1, seconds=None, threaded=False, stream=None, buffer_lines=256):
+        self.output_type = output_type   # 'table', 'list' or 'none'
+        self.N1, self.N2, self.N3 = N1, N2, N3   # age ring sizes (for colouring node numbers)
+        self.days = days   # table mode: simulated days between rows
+        self.seconds = seconds   # real seconds between table rows (instead of days), or between list mode writes
+        self.stream = stream if stream is not None else sys.stdout
+        self.buffer_lines = buffer_lines   # list mode: the most lines to collect before writing them
+        self.buffer = []   # formatted text waiting to be written
+        self.last_write = time.monotonic()   # real time of the last write
+        self.period = None   # table mode: the simulated day (or block of `days` days) of the latest statistics
+        self.latest = None   # table mode: the latest statistics that haven't had a row yet
+
+        self.queue = None
+        if threaded==True and output_type!='none':
+            self.queue = queue.Queue()
+            self.thread = threading.Thread(target=self.work, daemon=True)
+            self.thread.start()
+
+    # prints the table header straight away (in table mode)
+    def header(self):
+        if self.output_type=='table':
+            self.send(('text', TABLE_HEADER))
+            self.flush()
+
+    # table mode: passes in the latest statistics, which are written as a row at most once per `days` days (or `seconds`)
+    def row(self, time, total, active, vaccinated, refused):
+        if self.output_type!='table':
+            return
+        if self.seconds is None:
+            # the statistics are held until a later day's arrive, so each row shows the end of its day
+            period = time // (24 * 3600) // self.days
+            if self.latest is not None and period!=self.period:
+                self.send(('row',)+self.latest)
+                self.flush()
+            self.latest = (time, total, active, vaccinated, refused)
+            self.period = period
+        else:
+            self.latest = (time, total, active, vaccinated, refused)
+            if self.elapsed():
+                self.send(('row',)+self.latest)
+                self.latest = None
+                self.flush()
+
+    # list mode: adds a line for an event ('infected', 'vaccinated' or 'refused'), where primary is the infecting node
+    def line(self, kind, time, node, primary=ev.NONE):
+        if self.output_type!='list':
+            return
+        self.send(('line', kind, time, node, primary))
+        if len(self.buffer)>=self.buffer_lines or (self.seconds is not None and self.elapsed()):
+            self.flush()
+
+    # writes any table row or lines still waiting, and stops the rendering thread
+    def close(self):
+        if self.latest is not None:   # the final statistics get a row, unless they have already been written
+            self.send(('row',)+self.latest)
+            self.latest = None
+        self.flush()
+        if self.queue is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.queue = None
+
+    # has `seconds` of real time passed since the last write?
+    def elapsed(self):
+        return time.monotonic()-self.last_write >= (self.seconds or 0)
+
+    # hands an item to the rendering thread, or formats it into the buffer
+    def send(self, item):
+        if self.queue is not None:
+            self.queue.put(item)
+            self.buffer.append(None)   # keeps count of the lines handed over since the last flush
+        else:
+            self.buffer.append(self.text(item))
+
+    # writes the buffer in one go (or tells the rendering thread to)
+    def flush(self):
+        self.last_write = time.monotonic()
+        if self.queue is not None:
+            self.queue.put('flush')
+            self.buffer = []
+        elif self.buffer:
+            self.stream.write("".join(self.buffer))
+            self.stream.flush()
+            self.buffer = []
+
+    # turns an item into the text to write
+    def text(self, item):
+        if item[0]=='text':
+            return item[1]
+        if item[0]=='row':
+            time, total, active, vaccinated, refused = item[1:]
+            return '%-15s%-15s%-15s%-15s%-14s\n' % ("Day "+str(time // (24 * 3600)),"\U0001F9A0 "+str(total), "\U0001F4C8 " + str(active), "\U0001F489 "+str(vaccinated), "\U0001F645 "+str(refused))
+        kind, time, node, primary = item[1:]
+        start, middle = MESSAGES[kind]
+        if kind=='infected':
+            return start+NodeColour(primary, self.N1, self.N2, self.N3)+middle+NodeColour(node, self.N1, self.N2, self.N3)+" at "+ConvertTime(time)+"\n"
+        return start+NodeColour(node, self.N1, self.N2, self.N3)+middle+" at "+ConvertTime(time)+"\n"
+
+    # the rendering thread: formats items as they arrive, writing them out whenever it is told to flush
+    def work(self):
+        pending = []
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if item=='flush':
+                if pending:
+                    self.stream.write("".join(pending))
+                    self.stream.flush()
+                    pending = []
+            else:
+                pending.append(self.text(item))
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+# ------ SAMPLER NOTES ------
+# Drawing one random number at a time from NumPy costs around a microsecond per call, which adds up over millions of events.
+# A SamplerPool instead draws a whole block of values for each named distribution at once (from a numpy.random.Generator)
+# and hands them out one by one with next(), or several at a time with take(), drawing a new block whenever one runs out.
+# Distributions are registered by name before use, e.g. pool.lognormal('generation', g_mu, g_sigma).
+
+class SamplerPool:
+    def __init__(self, rng=None, block=4096):
+        self.rng = rng if rng is not None else np.random.default_rng()   # the generator that every block is drawn from
+        self.block = block   # how many values to draw at once for each distribution
+        self.draws = {}   # for each name, a function which draws a given number of values
+        self.blocks = {}   # for each name, the current block of values
+        self.positions = {}   # for each name, the position of the next unused value in its block
+
+    # registers a distribution under a name, given a function that draws an array of a given size from it
+    def add(self, name, draw):
+        self.draws[name] = draw
+        self.blocks[name] = draw(self.block)
+        self.positions[name] = 0
+
+    # registers a lognormal distribution
+    def lognormal(self, name, mu, sigma):
+        self.add(name, lambda size: self.rng.lognormal(mu, sigma, size))
+
+    # registers a uniform distribution between 0 and 1
+    def uniform(self, name):
+        self.add(name, lambda size: self.rng.random(size))
+
+    # returns the next value from a named distribution
+    def next(self, name):
+        position = self.positions[name]
+        if position==len(self.blocks[name]):   # if the block has run out, draw a new one
+            self.blocks[name] = self.draws[name](self.block)
+            position = 0
+        self.positions[name] = position+1
+        return self.blocks[name][position]
+
+    # returns the next n values from a named distribution as an array
+    def take(self, name, n):
+        position = self.positions[name]
+        block = self.blocks[name]
+        if position+n<=len(block):   # if the current block has enough values left, return a slice of it
+            self.positions[name] = position+n
+            return block[position:position+n]
+
+        # otherwise use up the current block and draw the rest (plus a fresh block for later)
+        values = np.concatenate((block[position:], self.draws[name](n-(len(block)-position))))
+        self.blocks[name] = self.draws[name](self.block)
+        self.positions[name] = 0
+        return values
+
+
+# function to return the next event time, with the wait (in days) drawn from a named distribution in the pool
+def NewEventTime(time, pool, name):
+    wait=int((24*60*60)*pool.next(name))   # how long will it be (in seconds) until the next event?
+    return time+wait
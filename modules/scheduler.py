@@ -0,0 +1,109 @@
+import heapq
+import itertools
+import numpy as np
+
+from modules import events as ev
+
+
+# ------ SCHEDULER NOTES ------
+# The scheduler is a binary heap of pending events, replacing the old pattern of min() followed by remove() on a plain list.
+# Each heap entry is a (time, order, event) tuple, where order is an ever-increasing counter. Events with equal times are
+# therefore popped in the order they were added, which is exactly how min() resolved ties on the old (insertion-ordered) list.
+# The scheduler also keeps a live count of pending events of each type, so checks like "are there any transmissions left?"
+# are constant-time instead of filtering the whole queue.
+#
+# Immunity expiry events ('unvax' and 'resusceptible') are added with expire() rather than append(). Each node has an immunity
+# epoch which expire() increases, stamping the new event with it; any older expiry event still pending for that node is then
+# stale (e.g. the 'unvax' from last year's vaccine when the node is re-vaccinated). Stale events are never returned by pop():
+# they are skipped once they reach the front of the heap, and the heap is rebuilt without them whenever they make up more
+# than half of it, so they don't bloat the queue either.
+
+class Scheduler:
+    def __init__(self):
+        self.heap = []   # the heap of (time, order, event) entries
+        self.order = itertools.count()   # tie-breaker so that equal times are popped first-in, first-out
+        self.counts = [0]*len(ev.NAMES)   # the number of pending events of each type (indexed by type code)
+        self.epochs = {}   # the latest immunity epoch for each node that has had an expiry event
+        self.expiring = {}   # the type of each node's current (not stale) pending expiry event
+        self.stale = 0   # the number of stale expiry events still in the heap
+
+    def __len__(self):
+        return len(self.heap)-self.stale
+
+    def __bool__(self):
+        return len(self.heap) != 0
+
+    # adds an event to the queue (named append so that functions which build event lists can fill a scheduler directly)
+    def append(self, event):
+        heapq.heappush(self.heap, (event.time, next(self.order), event))
+        self.counts[event.type]+=1
+
+    # adds an immunity expiry event to the queue, superseding any earlier expiry event still pending for the same node
+    def expire(self, event):
+        node = event.node
+        if node in self.expiring:   # if the node already had an expiry event pending, it is now stale
+            self.counts[self.expiring[node]]-=1
+            self.stale+=1
+        self.epochs[node] = self.epochs.get(node, 0)+1
+        self.expiring[node] = event.type
+        event.stamp = self.epochs[node]
+        self.append(event)
+
+        if self.stale>len(self.heap)//2:
+            self.compact()
+        else:
+            self.drop_stale()
+
+    # adds several events to the queue at once
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    # adds many events of one type at once, given arrays of their times and nodes (equivalent to appending them in that order,
+    # but when the new events outnumber the queue they are added in one go and the heap is rebuilt, which takes linear time)
+    def schedule(self, type, times, nodes):
+        times, nodes = np.asarray(times).tolist(), np.asarray(nodes).tolist()
+        entries = [(time, next(self.order), ev.Event(type, time, node)) for time, node in zip(times, nodes)]
+        if len(entries)>len(self.heap):
+            self.heap.extend(entries)
+            heapq.heapify(self.heap)
+        else:
+            for entry in entries:
+                heapq.heappush(self.heap, entry)
+        self.counts[type]+=len(entries)
+
+    # removes and returns the earliest event in the queue
+    def pop(self):
+        event = heapq.heappop(self.heap)[2]
+        self.counts[event.type]-=1
+        if event.stamp:   # this is the node's current expiry event, so the node has none pending any more
+            del self.expiring[event.node]
+        self.drop_stale()
+        return event
+
+    # checks whether an event is an expiry event which has been superseded
+    def is_stale(self, event):
+        return event.stamp!=0 and event.stamp!=self.epochs[event.node]
+
+    # removes stale events from the front of the heap, so that the earliest event in the heap is always a real one
+    def drop_stale(self):
+        while self.heap and self.is_stale(self.heap[0][2]):
+            heapq.heappop(self.heap)
+            self.stale-=1
+
+    # rebuilds the heap without any stale events
+    def compact(self):
+        self.heap = [entry for entry in self.heap if not self.is_stale(entry[2])]
+        heapq.heapify(self.heap)
+        self.stale = 0
+
+    # removes all pending events (used to end a simulation early)
+    def clear(self):
+        self.heap = []
+        self.counts = [0]*len(ev.NAMES)
+        self.expiring = {}
+        self.stale = 0
+
+    # returns how many events of the given type are still waiting in the queue
+    def pending(self, type):
+        return self.counts[type]
@@ -0,0 +1,57 @@
+import math
+import numpy as np
+
+
+# ------ SEVERITY NOTES ------
+# Case severities are drawn from an age-based lognormal distribution, divided by a scale factor and capped at 1. This used to be
+# done by redrawing single lognormals until one came out at or below 1, which can take several draws per infection.
+# Here the truncated distribution is sampled exactly in vectorised blocks: since lognormal(mu, sigma) = exp(mu + sigma*Z) for a
+# standard normal Z, the severity is at most 1 exactly when Z <= (ln(scale) - mu)/sigma, so blocks of normals are drawn and
+# only those below the cut-off are kept.
+# Each node's age ring (0 = children, 1 = adults, 2 = elderly) is looked up in a precomputed array.
+
+SCALE = 8   # scale factor for severities
+MIN_ACCEPT = 1e-6   # the smallest fraction of draws at or below 1 that a severity distribution can have
+
+STREAMS = ('severity1', 'severity2', 'severity3')   # names of each age ring's severity distribution in a SamplerPool
+
+
+# returns an array of every node's age ring (0 = children, 1 = adults, 2 = elderly)
+def RingArray(N1, N2, N3):
+    return np.repeat(np.arange(3, dtype=np.int8), [N1, N2, N3])
+
+
+# returns the cut-off (the largest normal draw that gives a severity of at most 1) and the fraction of normal draws below it,
+# raising a ValueError for parameters that would (almost) never give a severity of at most 1
+def Acceptance(mu, sigma, scale=SCALE):
+    if not sigma>0:
+        raise ValueError("Severity sigma must be positive, not "+str(sigma))
+    cutoff = (np.log(scale)-mu)/sigma
+    accept = 0.5*math.erfc(-cutoff/math.sqrt(2))   # the fraction of normal draws below the cut-off
+    if accept<MIN_ACCEPT:
+        raise ValueError("Severity distribution (mu="+str(mu)+", sigma="+str(sigma)+") is almost never at most 1, so it can't be truncated")
+    return cutoff, accept
+
+
+# draws an array of case severities from lognormal(mu, sigma)/scale, truncated so that no severity is above 1
+def TruncatedLognormal(rng, mu, sigma, size, scale=SCALE):
+    cutoff, accept = Acceptance(mu, sigma, scale)
+
+    kept = []
+    needed = size
+    while needed>0:
+        z = rng.standard_normal(int(needed/max(accept, 1e-3)*1.1)+16)   # draws a block slightly larger than should be needed (at most ~1000 draws per severity, looping until there are enough)
+        z = z[z<=cutoff][:needed]
+        kept.append(z)
+        needed-=len(z)
+
+    z = np.concatenate(kept) if kept else np.zeros(0)
+    return np.exp(mu+sigma*z)/scale
+
+
+# registers each age ring's truncated severity distribution in a SamplerPool (under the names in STREAMS), checking the
+# parameters straight away
+def AddStreams(pool, params, scale=SCALE):
+    for r, (mu, sigma) in enumerate(params):
+        Acceptance(mu, sigma, scale)
+        pool.add(STREAMS[r], lambda size, mu=mu, sigma=sigma: TruncatedLognormal(pool.rng, mu, sigma, size, scale))
@@ -0,0 +1,81 @@
+import sys
+import numpy as np
+from multiprocessing import shared_memory
+
+from modules import network as nw
+
+
+# ------ SHARED NETWORK NOTES ------
+# When replicates run in several worker processes, each worker would otherwise need its own copy of the network (pickled
+# across, or rebuilt from scratch), multiplying memory use by the number of workers. Instead, the parent process publishes
+# the CSR arrays of both network layers once into shared memory with a SharedNetwork, and passes its small `spec` (the name,
+# shape and type of each array) to the workers. Each worker calls Attach(spec) to get CSR networks whose arrays are read-only
+# views of the same shared memory, so there is only ever one copy of the graph however many workers there are.
+# Workers stay attached until they exit, and the parent must call close() once every worker has finished, which frees the
+# shared memory.
+
+ARRAYS = ('indptr', 'indices', 'degree', 'bindptr', 'bindices', 'bdegree')   # the arrays shared for each network
+
+attached = {}   # the networks this process has already attached to, by the name of their first block (so each is attached once)
+
+
+class SharedNetwork:
+    def __init__(self, neighbours, bneighbours):
+        arrays = {'indptr': neighbours.indptr, 'indices': neighbours.indices, 'degree': neighbours.degree,
+                  'bindptr': bneighbours.indptr, 'bindices': bneighbours.indices, 'bdegree': bneighbours.degree}
+
+        self.blocks = []   # the shared memory blocks (kept open until close())
+        self.spec = {}   # for each array, (block name, shape, dtype), which is all a worker needs to attach
+        try:
+            for name in ARRAYS:
+                array = np.asarray(arrays[name])
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array   # copies the array into shared memory
+                self.spec[name] = (block.name, array.shape, array.dtype.str)
+        except Exception:
+            self.close()   # frees the blocks already created if a later one can't be
+            raise
+
+    # frees the shared memory (only call this once the workers are finished with the network)
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# attaches to a shared memory block without this process taking ownership of it. Before Python 3.13 every attached block is
+# registered with the resource tracker, but worker processes started by the publishing process share its tracker, so the
+# block is still only deleted once (by close() in the parent)
+def OpenBlock(name):
+    if sys.version_info>=(3,13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+# returns (neighbours, bneighbours) as read-only CSR networks viewing a SharedNetwork's memory, given its spec
+def Attach(spec):
+    key = spec['indptr'][0]
+    if key in attached:
+        return attached[key][0]
+
+    blocks = []
+    arrays = {}
+    for name in ARRAYS:
+        block_name, shape, dtype = spec[name]
+        block = OpenBlock(block_name)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        arrays[name].flags.writeable = False   # no process may change the shared network
+        blocks.append(block)
+
+    network = (nw.CSR(arrays['indptr'], arrays['indices'], arrays['degree']), nw.CSR(arrays['bindptr'], arrays['bindices'], arrays['bdegree']))
+    attached[key] = (network, blocks)   # keeps the blocks open until this process exits (workers reuse the network for every task)
+    return network
+
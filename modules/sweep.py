@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from modules import network as nw
+from modules import outbreak as ob
+from modules import ensemble as ens
+from modules import netcache as nc
+from modules import sharednet as sn
+
+
+# ------ SWEEP NOTES ------
+# Runs a parameter sweep: every combination of a declarative grid of parameter values, e.g.
+#       {'av_frac': [0.0, 0.1, 0.2], 'v_mode': [90, 180]}
+# (with any parameters not in the grid taken from `base`, then outbreak.DEFAULTS), for a number of replicates each.
+# Every (combination, replicate) task is run across a ProcessPoolExecutor, and its result is written to a checkpoint file (one
+# JSON line per task) the moment it finishes, so a crash only ever loses the tasks that were running. Running the same sweep
+# again with the same checkpoint file skips every task already in it, carrying on from where it stopped.
+# Each task's random stream is spawned from the sweep's seed using a hash of the task's key (its parameters and replicate),
+# so a resumed sweep runs exactly the same tasks as it would have the first time, even if values were added to the grid
+# since. Combinations which share a network (the same N1, N2, N3 and factor) share one network, built once (or loaded from
+# the network cache) and published in shared memory.
+
+
+# returns every combination of the grid's values as a list of dictionaries (the last parameter changing fastest)
+def Grid(grid):
+    names = list(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+
+# returns the key that identifies a task in the checkpoint file (its parameters and replicate number)
+def TaskKey(params, replicate):
+    return json.dumps(params, sort_keys=True, default=str)+"#"+str(replicate)
+
+
+# returns the spawn key of a task's random stream: a hash of its TaskKey, as four 32-bit words (so it doesn't depend on where
+# the task comes in the grid)
+def SpawnKey(params, replicate):
+    digest = hashlib.sha256(TaskKey(params, replicate).encode()).digest()
+    return tuple(np.frombuffer(digest[:16], dtype=np.uint32).tolist())
+
+
+# converts NumPy values in a results dictionary into plain Python values (so they can be written as JSON)
+def Plain(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# returns every task recorded in a checkpoint file, as a list of {'params', 'replicate', 'result'} dictionaries
+def Load(checkpoint):
+    records = []
+    if os.path.exists(checkpoint)==False:
+        return records
+    with open(checkpoint) as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:   # a line left half-written by a crash (that task will just be run again)
+                pass
+    return records
+
+
+# runs a single task in a worker process, on the network published in shared memory
+def RunTask(task):
+    params, spec, replicate, seed = task
+    neighbours, bneighbours = sn.Attach(spec)
+    return params, replicate, ob.Simulate(params, neighbours, bneighbours, np.random.default_rng(seed))
+
+
+# runs every (combination, replicate) task in the grid that isn't already in the checkpoint file, recording each as it finishes,
+# and returns every task's record (including those from earlier runs). workers is the number of processes (all cores by default)
+def RunSweep(grid, replicates, checkpoint, base=None, seed=0, workers=None, cache='network_cache'):
+    records = Load(checkpoint)
+    done = set(TaskKey(record['params'], record['replicate']) for record in records)
+
+    # works out the tasks still to do, grouped by the network they run on
+    groups = {}
+    for combination in Grid(grid):
+        params = ob.Parameters(base)
+        params.update(combination)
+        ob.Check(params)   # rejects misspelt parameters or schemes before anything runs
+        network = (params['N1'], params['N2'], params['N3'], params['factor'])
+        for replicate in range(replicates):
+            if TaskKey(params, replicate) not in done:
+                task_seed = np.random.SeedSequence(seed, spawn_key=SpawnKey(params, replicate))   # the same stream however often the sweep restarts
+                groups.setdefault(network, []).append((params, replicate, task_seed))
+
+    workers = workers if workers is not None else os.cpu_count()
+    networks = nc.NetworkCache(cache) if cache is not None else None
+
+    with open(checkpoint, 'a') as file:
+        if file.tell()>0:
+            with open(checkpoint, 'rb') as last:
+                last.seek(-1, os.SEEK_END)
+                if last.read(1)!=b"\n":   # starts a new line after any line left half-written
+                    file.write("\n")
+
+        for (N1, N2, N3, factor), tasks in groups.items():
+            if networks is not None:
+                nodes, neighbours, bneighbours = networks.get(N1, N2, N3, factor, seed)
+            else:
+                nodes, neighbours, bneighbours = nw.MakeNetworks(N1, N2, N3, factor, csr=True, rng=np.random.default_rng(seed))
+
+            with sn.SharedNetwork(neighbours, bneighbours) as shared:
+                with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                    futures = [executor.submit(RunTask, (params, shared.spec, replicate, task_seed)) for params, replicate, task_seed in tasks]
+                    for future in as_completed(futures):
+                        params, replicate, result = future.result()
+                        record = {'params': params, 'replicate': replicate, 'result': {name: Plain(value) for name, value in result.items()}}
+
+                        # records the task straight away (and makes sure it is on disk before moving on)
+                        file.write(json.dumps(record, default=str)+"\n")
+                        file.flush()
+                        os.fsync(file.fileno())
+                        records.append(record)
+
+    return records
+
+
+# converts sweep records into a structured array with a column for each swept parameter, followed by the RESULT columns
+def ToArray(records, grid):
+    columns = [(name, np.asarray(grid[name]).dtype if np.asarray(grid[name]).dtype.kind in 'biuf' else object) for name in grid]
+    table = np.zeros(len(records), dtype=columns+ens.RESULT.descr)
+    for i, record in enumerate(records):
+        row = ens.ResultRow(record['replicate'], record['result'])
+        table[i] = tuple(record['params'][name] for name in grid)+tuple(row)
+    return table
@@ -0,0 +1,27 @@
+import numpy as np
+
+from modules import events as ev
+
+
+# ------ TRANSMISSION NOTES ------
+# When a node becomes infected, every one of its physical neighbours gets a chance (beta) of being infected by it. Rather than
+# looping over the neighbours and drawing one random number at a time, the infection kernel below takes the primary's whole
+# neighbour array and draws every roll and generation time as arrays, filters out immune neighbours with fancy indexing,
+# and adds the resulting transmission events to the queue in one go. It is shared by main.py and covid_game.py.
+
+
+# schedules every transmission from a newly infected primary, returning the nodes that it will try to infect
+def Infect(events, primary, time, nbrs, immune, beta, pool, legacy_waning=False):
+    rolls = pool.take('uniform', len(nbrs))   # determines which neighbours the primary infects...
+    secondaries = nbrs[(rolls<beta) & ~immune[nbrs]]   # ...ignoring any that are already immune
+
+    # when will the primary infect each secondary?
+    transmission_times = time+((24*60*60)*pool.take('generation', len(secondaries))).astype(np.int64)
+    events.extend([ev.Event(ev.TRANS, t, s, primary) for t, s in zip(transmission_times.tolist(), secondaries.tolist())])
+
+    # in legacy mode, generates a time for the post-infection immunity to wear off for every transmission attempt
+    if legacy_waning == True:
+        resusceptible_times = transmission_times+((24*60*60)*pool.take('post_infection', len(secondaries))).astype(np.int64)
+        events.extend([ev.Event(ev.RESUSCEPTIBLE, t, s) for t, s in zip(resusceptible_times.tolist(), secondaries.tolist())])
+
+    return secondaries
@@ -1,116 +1,163 @@
 import numpy as np
-import random
 
+from modules import events as ev
 
-def Event(type, time, node):
-    # each event is a small dictionary with keys...
-            # type: the type of event which occurs
-            # time: the time that the event occurs 
-            # primary: the node that is doing the infecting
-            # secondary: the node that is being infected
 
-    event={'type':type,
-            'time':time,
-            'node':node}
+# ------ VACCINATION NOTES ------
+# Each vaccination method below builds a schedule of first offers: a pair of typed arrays (offer times in seconds as int64,
+# and the nodes being offered), which outbreak.py adds to the event queue in one go (or hands to a campaign or cohorts).
+# Nodes are chosen with one random permutation per ring (rather than picking unchosen nodes one at a time, which took O(N^2)
+# time and, by enumerating the filtered array, picked positions rather than node numbers, so low-numbered nodes were offered
+# far more often), and all of a ring's lognormal offer times are drawn in one call.
 
-    return event
+DAY = 24*60*60   # seconds in a day
+YEAR = 365*DAY   # seconds in a year (the time between a node's vaccination offers)
 
 
-# function to return the next event time
-def NewEventTime(time, mu, sigma):
-    wait=int((24*60*60)*np.random.lognormal(mu,sigma))   # how long will it be (in seconds) until the next event?
-    return time+wait
+# returns lognormal offer times (in seconds, after `offset` days) for `size` nodes, in one draw
+def OfferTimes(rng, mu, sigma, size, offset=0):
+    return (DAY*rng.lognormal(mu, sigma, size)).astype(np.int64) + offset*DAY
 
 
-# this was the default vaccination method used in outbreak_sim.py before 21/12
-def RandomVax(fraction, totalN, events):
-    vaxevents_no=int(fraction*totalN)
-    picked=np.zeros(totalN, dtype=bool)   # starts with an array of all "false" (unvaccinated)
+# returns (times, nodes) for offering vaccination to a random `fraction` of totalN nodes at a random second within the first
+# year (after a wait in days). This was the default vaccination method used in outbreak_sim.py before 21/12
+def RandomSchedule(fraction, totalN, rng, wait=0):
+    nodes = rng.permutation(totalN)[:int(fraction*totalN)]   # picks the nodes to vaccinate
+    times = rng.integers(0, 31536000, size=len(nodes)) + int(wait*DAY)   # delays vaccination until the vaccination scheme begins
+    return times.astype(np.int64), nodes
 
-    # picking nodes to vaccinate....
-    for x in range(vaxevents_no):
-        pick = random.choice(list(enumerate(picked[picked==False])))   # picks a random unvaccinated node
-        picked[pick[0]] = True
-        vax_time = np.random.randint(0,31536000)   # picks a random second within the first year to vaccinate
-        events.append(Event('vax', vax_time, pick[0]))   # creates a vax event and adds to the list
 
-    return events
+# ------ WAVE NOTES ------
+# A vaccination rollout can be described as a list of waves, each a dictionary of:
+        # ring: the age ring offered vaccination (0 = children, 1 = adults, 2 = elderly)
+        # start: the day the wave starts
+        # coverage: the fraction of the ring offered vaccination
+        # mu, sigma: the lognormal distribution of offer times (in days after the start)
+# AGE_WAVES is the UK-style rollout used by AgeWaveSchedule, and new rollout shapes only need a new list of waves.
 
+# creates an appropriate shape compared to data (used https://www.medcalc.org/manual/log-normal-distribution-functions.php to visualise)
+AGE_WAVES = [{'ring': 2, 'start': 330, 'coverage': 1, 'mu': 4.5, 'sigma': 1},   # first (elderly) vaccine in the uk was after 11 months - this is a correction to delay all vaccines
+             {'ring': 1, 'start': 400, 'coverage': 1, 'mu': 4.5, 'sigma': 1},   # delays adult vaccination by ~13 months (2 months after elderly vax begins)
+             {'ring': 0, 'start': 450, 'coverage': 0.05, 'mu': 4.5, 'sigma': 1}]   # delays youth vaccination by ~15 months, with a low fraction to reflect low vax rate in children
 
-# ------ AGE WAVE VAX NOTES ------
-# This method can offer staggered vaccination to the three rings of nodes, which is meant to simulate age-based vax rollout.
-# There is also a condensed version of this (LogDistVax), which is the same but all rings use the same timescale (no waves).
-
-def AgeWaveVax(frac, N1, N2, N3, events):
-    picked1=np.zeros(N1, dtype=bool)   # starts with an array of all "false" children (not offered vaccination)
-    picked2=np.zeros(N2, dtype=bool)   # starts with an array of all "false" adults (not offered vaccination)
-    picked3=np.zeros(N3, dtype=bool)   # starts with an array of all "false" elderly (not offered vaccination)
-
-    # creates an appropriate shape compared to data (used https://www.medcalc.org/manual/log-normal-distribution-functions.php to visualise)
-    N3_sigma = 1
-    N3_mu = 4.5
-
-    # picking ring 3 (elderly) nodes to vaccinate first...
-    for x in range(int(frac*N3)):
-        pick = random.choice(list(enumerate(picked3[picked3==False])))   # pick a random elderly node
-        picked3[pick[0]] = True   # mark the node as chosen
-
-        picked3[pick[0]] = True
-
-        vax_time = NewEventTime(0, N3_mu, N3_sigma)   # picks a random second within the first year to vaccinate
-        vax_time = vax_time + (330*24*60*60)   # first (elderly) vaccine in the uk was after 11 months - this is a correction to delay all vaccines
-
-        events.append(Event('vax', vax_time, pick[0]))   # creates a vax event and adds to the list
-
-    
-    # picking ring 2 (adult) nodes to vaccinate next...
-    for x in range(int(frac*N2)):
-        pick = random.choice(list(enumerate(picked2[picked2==False])))   # pick a random adult node
-        picked2[pick[0]] = True   # mark the node as chosen
 
-        vax_time = NewEventTime(0, N3_mu, N3_sigma)   # picks a random second within the first year to vaccinate
-        vax_time = vax_time + (400*24*60*60)   # delays adult vaccination by ~13 months (2 months after elderly vax begins)
+# returns (times, nodes) for offering vaccination in a list of waves (see WAVE NOTES)
+def WaveSchedule(waves, N1, N2, N3, rng):
+    bounds = [0, N1, N1+N2, N1+N2+N3]   # the first node of each ring (and the end of the last)
+    times, nodes = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for wave in waves:
+        start, size = bounds[wave['ring']], bounds[wave['ring']+1]-bounds[wave['ring']]
+        picks = start + rng.permutation(size)[:int(wave['coverage']*size)]
+        nodes.append(picks)
+        times.append(OfferTimes(rng, wave['mu'], wave['sigma'], len(picks), wave['start']))
 
-        events.append(Event('vax', vax_time, pick[0]))   # creates a vax event and adds to the list
+    return np.concatenate(times), np.concatenate(nodes)
 
 
-    # lowers the fraction significantly to reflect low vax rate in children
-    frac = 0.05
-
-    # picking ring 1 (child) nodes to vaccinate last...
-    for x in range(int(frac*N1)):
-        pick = random.choice(list(enumerate(picked1[picked1==False])))   # pick a random youth node
-        picked1[pick[0]] = True   # mark the node as chosen
-
-        vax_time = NewEventTime(0, N3_mu, N3_sigma)   # picks a random second within the first year to vaccinate
-        vax_time = vax_time + (450*24*60*60)   # delays youth vaccination by ~15 months (2 months after adult vax begins)
-
-        events.append(Event('vax', vax_time, pick[0]))   # creates a vax event and adds to the list
-
-    return events
+# ------ AGE WAVE VAX NOTES ------
+# This method can offer staggered vaccination to the three rings of nodes, which is meant to simulate age-based vax rollout.
+# There is also a condensed version of this (LogDistSchedule), which is the same but all rings use the same timescale (no waves).
 
+# returns (times, nodes) for offering vaccination in age waves: the elderly first (after 330 days), then adults (400 days)
+# and a small fraction of children (450 days), each with lognormal offer times
+def AgeWaveSchedule(frac, N1, N2, N3, rng):
+    waves = [dict(wave, coverage=frac) if wave['ring']!=0 else wave for wave in AGE_WAVES]
+    return WaveSchedule(waves, N1, N2, N3, rng)
 
 
 # ------ LOG DIST VAX NOTES ------
-# This method can offers vaccination to all three rings of nodes simultaneously (no age-based waves).
-# This is a simplified version of AgeBasedVax.
-
-def LogDistVax(frac, N, events):
-    picked=np.zeros(N, dtype=bool)   # starts with an array of all "false" nodes (not offered vaccination)
+# This method offers vaccination to all three rings of nodes simultaneously (no age-based waves).
+# This is a simplified version of AgeWaveSchedule.
 
+# returns (times, nodes) for offering vaccination to a fraction of all N nodes with lognormal offer times, after 40 days
+def LogDistSchedule(frac, N, rng):
     # creates an appropriate shape compared to data (used https://www.medcalc.org/manual/log-normal-distribution-functions.php to visualise)
     N_sigma = 1
     N_mu = 5
 
-    # picking nodes to offer vaccination...
-    for x in range(int(frac*N)):
-        pick = random.choice(list(enumerate(picked[picked==False])))   # pick a random node
-        picked[pick[0]] = True   # mark the node as chosen
-
-        # picks a vaccination time after 40 days
-        vax_time = NewEventTime(0, N_mu, N_sigma)   # picks a random second to offer vaccination
-        vax_time = vax_time + (40*24*60*60)   # delay vaccination to start at 40 days
-
-        events.append(Event('vax', vax_time, pick[0]))   # creates a vax event and adds to the list
-
-    return events
\ No newline at end of file
+    nodes = rng.permutation(N)[:int(frac*N)]
+    return OfferTimes(rng, N_mu, N_sigma, len(nodes), 40), nodes
+
+
+# ------ YEARLY OFFERS NOTES ------
+# After its first offer, every node is offered vaccination again every year. Scheduling each re-offer as its own event when
+# the previous offer is processed means the queue always holds a pending offer for every node. Instead, a YearlyOffers
+# campaign stores each node's phase (the time of year of its offers) and the year of its first offer, sorted by phase, so
+# the offers due in any stretch of time are a contiguous slice found with searchsorted. Only the offers due in the next
+# `window` (a day by default) are released into the queue at once, followed by a 'campaign' event which releases the next.
+
+class YearlyOffers:
+    def __init__(self, times, nodes, period=YEAR, window=DAY):
+        times = np.asarray(times, dtype=np.int64)
+        phases = times % period
+        order = np.argsort(phases, kind='stable')
+        self.phases = phases[order]   # the time of year (in seconds) of each node's offers, in order
+        self.nodes = np.asarray(nodes)[order]   # the node with each phase
+        self.first = (times // period)[order]   # the year of each node's first offer (there are no offers before it)
+        self.period = period   # time between a node's offers
+        self.window = window   # how far ahead offers are released into the queue
+        self.released = 0   # offers before this time have been released
+
+    # adds every offer due between the last release and `until` to the queue
+    def release(self, events, until):
+        start = self.released
+        while start<until:
+            year = start // self.period
+            end = min(until, (year+1)*self.period)   # releases up to the end of the year, then carries on into the next
+            low = np.searchsorted(self.phases, start-year*self.period)
+            high = np.searchsorted(self.phases, end-year*self.period)
+            due = low + np.flatnonzero(self.first[low:high]<=year)   # ignores nodes whose first offer is in a later year
+            if len(due)>0:
+                events.schedule(ev.VAX, year*self.period+self.phases[due], self.nodes[due])
+            start = end
+        self.released = max(self.released, until)
+
+    # releases the offers due in the next window, and schedules the 'campaign' event which releases the window after
+    def tick(self, events, time):
+        self.release(events, time+self.window)
+        events.append(ev.Event(ev.CAMPAIGN, time+self.window, ev.NONE))
+
+
+
+# ------ COHORT NOTES ------
+# Rather than processing every vaccination offer as its own event, Cohorts groups the offers into one cohort per day, and a
+# single 'cohort' event (whose node field is the cohort's number) offers vaccination to the whole cohort at the start of its
+# day. Acceptance (pro-vax opinions), immunity and the vaccine waning times are all applied to the cohort at once with NumPy
+# masks, and the cohort is offered vaccination again (as one event) a year later.
+
+class Cohorts:
+    def __init__(self, times, nodes, period=YEAR):
+        times = np.asarray(times, dtype=np.int64)
+        order = np.argsort(times, kind='stable')
+        days, starts = np.unique(times[order] // DAY, return_index=True)
+        self.days = days   # the day of each cohort
+        self.groups = np.split(np.asarray(nodes)[order], starts[1:])   # the nodes in each cohort
+        self.period = period   # time between a cohort's offers
+
+    # adds each cohort's first 'cohort' event to the queue
+    def start(self, events):
+        events.schedule(ev.COHORT, self.days*DAY, np.arange(len(self.days)))
+
+    # offers vaccination to a cohort, returning the nodes which accepted and refused
+    def offer(self, event, opinions, immune, active_vax, events, pool, eventslog, legacy_waning=False):
+        nodes = self.groups[event.node]
+        accept = opinions[nodes]==1   # pro-vax nodes (denoted 1) accept the vaccine
+        accepted, refused = nodes[accept], nodes[~accept]
+
+        immune[accepted] = True   # makes the nodes immune
+        active_vax[accepted] = True   # marks the nodes as actively vaccinated
+        eventslog.tally('vaccinated', len(accepted))
+        eventslog.tally('refused', len(refused))
+
+        # generates a time for each node's post-vaccination immunity to wear off (superseding earlier expiry events), or in
+        # legacy mode after every offer (even refusals)
+        waning = nodes if legacy_waning==True else accepted
+        end_times = event.time + (DAY*pool.take('vaccine', len(waning))).astype(np.int64)
+        for end_time, node in zip(end_times.tolist(), waning.tolist()):
+            if legacy_waning==True:
+                events.append(ev.Event(ev.UNVAX, end_time, node))
+            else:
+                events.expire(ev.Event(ev.UNVAX, end_time, node))
+
+        events.append(ev.Event(ev.COHORT, event.time+self.period, event.node))   # offers the cohort vaccination again next year
+        return accepted, refused
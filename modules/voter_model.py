@@ -1,48 +1,33 @@
 import numpy as np
-import random
 
-def Event(type, time, node):
-    # each event is a small dictionary with keys...
-            # type: the type of event which occurs
-            # time: the time that the event occurs 
-            # primary: the node that is doing the infecting
-            # secondary: the node that is being infected
+from modules import events as ev
 
-    event={'type':type,
-            'time':time,
-            'node':node}
 
-    return event
+# returns (times, nodes) for every node's first opinion event, in a random order and at a random time within the first timescale
+def OpinionSchedule(N, timescale, rng):
+    nodes = rng.permutation(N)
+    times = rng.integers(0, timescale, size=N, dtype=np.int64)   # initial opinion change is randomly performed within the first time period
+    return times, nodes
 
 
-def GetOpinionEvents(N1, N2, N3, events, timescale):
-    total = N1+N2+N3
-    picked=np.zeros(total, dtype=bool)   # starts with an array of all "false" (unvaccinated)
-
-    for i in range(total):
-        pick = random.choice(list(enumerate(picked[picked==False])))
-        time = np.random.randint(0,timescale)   # initial opinion change is randomly performed within the first time period
-        events.append(Event('opinion', time, pick[0]))   # creates an opinion event and adds to the list
-        picked[pick[0]]=True
-
+# adds each node's first opinion event to the queue in one go
+def GetOpinionEvents(N1, N2, N3, events, timescale, pool):
+    times, nodes = OpinionSchedule(N1+N2+N3, timescale, pool.rng)
+    events.schedule(ev.OPINION, times, nodes)
     return events
 
 
-def InitBehaviour(N, av_frac):
-    opinions = np.zeros(N, dtype=bool)   # an array keeping track of everyone's behaviour status
-    for i in range(N):
-        roll = np.random.uniform(0.0, 1.0)   # randomly initialises a pro/anti-vax stance for each node
-        if roll>=av_frac:
-            opinions[i]=1   # ZERO IS ANTI-VAX, ONE IS PRO-VAX
+# randomly initialises a pro/anti-vax stance for each node (ZERO IS ANTI-VAX, ONE IS PRO-VAX)
+def InitBehaviour(N, av_frac, pool):
+    return pool.rng.random(N)>=av_frac
 
-    return opinions
 
-
-def OpinionEvent(node, neighbours, opinions, severity):
+# performs opinion inheritance for a node, given its behavioural neighbours as an array (e.g. a slice of the CSR indices)
+def OpinionEvent(node, neighbours, opinions, severity, pool):
     changeflag = False   # introduces a flag to check whether node opinion flips
 
     if len(neighbours)>0:   # clause to avoid breaking on nodes with no neighbours
-        neighbourpick = np.random.choice(neighbours)   # chooses a random neighbour
+        neighbourpick = neighbours[int(pool.next('uniform')*len(neighbours))]   # chooses a random neighbour
 
         change_prob = 1.0   # probability of taking neighbours opinion is 1 by default
 
@@ -52,9 +37,8 @@ def OpinionEvent(node, neighbours, opinions, severity):
             selfchecker=False
 
             # checks if any neighbours had a "severe" case (above 0.8)
-            for i in range(len(neighbours)):
-                if severity[neighbours[i]]>=0.8:
-                    neighbourchecker=True
+            if np.any(severity[neighbours]>=0.8):
+                neighbourchecker=True
             # checks if the node itself has had a "severe" case (above 0.8)
             if severity[node]>=0.8:
                 selfchecker=True
@@ -68,7 +52,7 @@ def OpinionEvent(node, neighbours, opinions, severity):
                 change_prob = change_prob - 0.5
 
         # adopts neighbour's behaviour with the change probability
-        roll = np.random.uniform(0.0, 1.0)
+        roll = pool.next('uniform')
         if roll < change_prob:
             if opinions[node] != opinions[neighbourpick]:
                 changeflag=True
@@ -77,4 +61,49 @@ def OpinionEvent(node, neighbours, opinions, severity):
         return opinions[node], changeflag
 
     else:
-        return opinions[node], changeflag
\ No newline at end of file
+        return opinions[node], changeflag
+
+
+# ------ SWEEP NOTES ------
+# The voter model above is asynchronous: every node has its own opinion event every timescale, so there are N events (and N
+# calls to OpinionEvent) per timescale. SweepOpinions is a synchronous alternative, run from a single 'sweep' event every
+# timescale, which updates every node's opinion at once with NumPy: each node picks a random behavioural neighbour, the same
+# damping rule applies to pro-vax to anti-vax changes (-0.5 if any neighbour has had a severe case, -0.5 if the node itself
+# has), and every node adopts its pick's opinion from before the sweep with the resulting probability.
+# With blocks > 1 the nodes are instead updated in that many random blocks, one after another (random-sequential updating),
+# so later blocks see the changes made by earlier ones. The number of opinion changes is returned rather than one event each.
+
+SEVERE = 0.8   # the case severity counted as "severe" by the damping rule
+
+
+# returns whether each node has a behavioural neighbour which has had a severe case
+def SevereNeighbours(bneighbours, severity):
+    rows = np.repeat(np.arange(len(bneighbours)), bneighbours.degree)   # the node each neighbour belongs to
+    return np.bincount(rows, weights=severity[bneighbours.indices]>=SEVERE, minlength=len(bneighbours))>0
+
+
+# updates the opinions of an array of nodes at once, returning the number of opinion changes
+def UpdateBlock(nodes, bneighbours, opinions, severity, severe_neighbours, pool):
+    degree = bneighbours.degree[nodes]
+    nodes, degree = nodes[degree>0], degree[degree>0]   # nodes with no neighbours keep their opinion
+    picks = bneighbours.indices[bneighbours.indptr[nodes] + (pool.take('uniform', len(nodes))*degree).astype(np.int64)]   # chooses a random neighbour for each node
+
+    # probability of taking neighbours opinion is 1 by default, but lower for pro-vax to anti-vax changes if there are severe cases
+    change_prob = np.ones(len(nodes))
+    damped = (opinions[picks]==False) & (opinions[nodes]==True)
+    change_prob[damped] -= 0.5*severe_neighbours[nodes[damped]] + 0.5*(severity[nodes[damped]]>=SEVERE)
+
+    # adopts neighbours' behaviour with the change probability
+    changed = (pool.take('uniform', len(nodes))<change_prob) & (opinions[nodes]!=opinions[picks])
+    opinions[nodes[changed]] = opinions[picks[changed]]
+    return int(np.count_nonzero(changed))
+
+
+# updates every node's opinion (in `blocks` random blocks, or all at once), returning the number of opinion changes
+def SweepOpinions(bneighbours, opinions, severity, pool, blocks=1):
+    severe_neighbours = SevereNeighbours(bneighbours, severity)
+    order = pool.rng.permutation(len(opinions)) if blocks>1 else np.arange(len(opinions))
+    changes = 0
+    for block in np.array_split(order, blocks):
+        changes += UpdateBlock(block, bneighbours, opinions, severity, severe_neighbours, pool)
+    return changes
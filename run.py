@@ -0,0 +1,62 @@
+# Runs the simulation from the command line without any prompts, e.g.
+#       python run.py config.json --replicates 20 --workers 8 --seed 1 --set av_frac=0.4 --output results.csv
+# The (optional) config file is a JSON dictionary of outbreak parameters and settings (see DEFAULTS and SETTINGS in
+# modules/outbreak.py), and --set overrides single values. One row of results is written per replicate, as CSV.
+
+import sys
+import json
+import argparse
+import numpy as np
+
+from modules import outbreak as ob
+from modules import ensemble as ens
+
+
+# reads a --set value as JSON where possible (so numbers and lists keep their types), and as a string otherwise
+def ParseValue(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Run the disease/vaccination interplay simulation without any prompts.")
+    parser.add_argument("config", nargs="?", help="JSON file of outbreak parameters and settings")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="override a single parameter or setting")
+    parser.add_argument("--seed", type=int, help="seed for the whole run")
+    parser.add_argument("--replicates", type=int, default=1, help="number of outbreaks to run on the network")
+    parser.add_argument("--workers", type=int, help="number of processes for the replicates (default: every core)")
+    parser.add_argument("--output", help="CSV file to write the results to (default: print them)")
+    args = parser.parse_args(arguments)
+
+    config = {}
+    if args.config is not None:
+        with open(args.config) as file:
+            config.update(json.load(file))
+    for setting in args.set:
+        name, value = setting.split("=", 1)
+        config[name] = ParseValue(value)
+    if args.seed is not None:
+        config['seed'] = args.seed
+
+    # a single outbreak runs in this process, while several run as an ensemble on the same network
+    if args.replicates==1:
+        results = [ob.RunOutbreak(config)]
+    else:
+        params, rng, neighbours, bneighbours = ob.Setup(config)
+        results = ens.RunEnsemble(params, args.replicates, seed=config.get('seed'), workers=args.workers, neighbours=neighbours, bneighbours=bneighbours)
+
+    file = open(args.output, "w") if args.output is not None else sys.stdout
+    file.write("replicate,outbreak_size,infected,endemic,last_infection,ring1_cases,ring2_cases,ring3_cases,ring1_peak,ring2_peak,ring3_peak,vaccinated,refused,op_changes\n")
+    for i, result in enumerate(results):
+        ring_cases = np.asarray(result['ring_cases']).tolist()
+        ring_peaks = np.asarray(result['ring_peaks']).tolist()
+        row = [i, result['outbreak_size'], result['infected'], bool(result['endemic']), result['last_infection']] + ring_cases + ring_peaks + [result['vaccinated'], result['refused'], result['op_changes']]
+        file.write(",".join(str(value) for value in row)+"\n")
+    if file is not sys.stdout:
+        file.close()
+
+
+if __name__ == "__main__":
+    main()